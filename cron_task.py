@@ -40,10 +40,18 @@ def main():
         app = create_app()
         
         with app.app_context():
-            from src.core.paper_collector import collect_papers_for_all_users
+            from src.config import settings
+            from src.core.paper_collector import collect_papers_in_parallel, parse_shard
             
-            # 收集指定时间的用户论文
-            success_count, total_count, errors = collect_papers_for_all_users()
+            try:
+                shard = parse_shard(settings.COLLECT_SHARD)
+            except ValueError as e:
+                logger.error(f"COLLECT_SHARD 配置无效: {e}")
+                return
+            
+            # 收集指定时间的用户论文，按配置分片并在多个进程中并行处理
+            success_count, total_count, errors = collect_papers_in_parallel(
+                settings.COLLECT_WORKERS, shard=shard)
             
             if total_count == 0:
                 logger.info(f"当前时间 {current_time} 没有需要发送邮件的用户")
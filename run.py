@@ -19,6 +19,23 @@ sys.path.insert(0, project_root)
 
 from src import __version__
 
+def shard_arg(value):
+    """解析命令行中的分片参数，格式错误时由argparse输出用法错误"""
+    from src.core.paper_collector import parse_shard
+    try:
+        return parse_shard(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+def settings_shard(parser):
+    """解析配置中的 COLLECT_SHARD，格式错误时输出用法错误并退出"""
+    from src.config import settings
+    from src.core.paper_collector import parse_shard
+    try:
+        return parse_shard(settings.COLLECT_SHARD)
+    except ValueError as e:
+        parser.error(f"COLLECT_SHARD 配置无效: {e}")
+
 def main():
     """主入口函数"""
     parser = argparse.ArgumentParser(description='论文收集器')
@@ -36,6 +53,25 @@ def main():
     collect_parser = subparsers.add_parser('collect', help='收集论文')
     collect_parser.add_argument('--user-id', type=int, help='为指定用户ID收集论文')
     collect_parser.add_argument('--all-users', action='store_true', help='为所有用户收集论文')
+    collect_parser.add_argument('--engine', choices=['thread', 'async'], help='批量收集的抓取引擎 (默认: 配置中的COLLECT_ENGINE)')
+    collect_parser.add_argument('--workers', type=int, help='批量收集的进程数 (默认: 配置中的COLLECT_WORKERS)')
+    collect_parser.add_argument('--shard', type=shard_arg, help='只处理指定分片的用户，格式为 i/N (默认: 配置中的COLLECT_SHARD)')
+    
+    # 发送发件箱中邮件的子命令
+    queue_parser = subparsers.add_parser('send-queue', help='发送发件箱中等待发送的邮件')
+    queue_parser.add_argument('--workers', type=int, help='并发发送数 (默认: 配置中的EMAIL_SEND_WORKERS)')
+    queue_parser.add_argument('--limit', type=int, help='本次最多发送的邮件数')
+    
+    # 预热子命令
+    warm_parser = subparsers.add_parser('warm-up', help='预先下载即将到达发送时间的用户的订阅源')
+    warm_parser.add_argument('--minutes', type=int, help='预热多少分钟之后到期的用户 (默认: 配置中的SCHEDULER_PREFETCH_MINUTES)')
+    
+    # 投递调度器子命令
+    subparsers.add_parser('scheduler', help='启动常驻的投递调度器，按用户设置的发送时间收集并发送论文')
+    
+    # 主机熔断状态子命令
+    hosts_parser = subparsers.add_parser('hosts', help='查看处于熔断状态的订阅源主机')
+    hosts_parser.add_argument('--reset', nargs='?', const='', metavar='HOST', help='关闭指定主机（省略时为全部主机）的熔断')
     
     # 数据库初始化子命令
     db_parser = subparsers.add_parser('init-db', help='初始化数据库')
@@ -65,8 +101,11 @@ def main():
         
         with app.app_context():
             if args.all_users:
-                from src.core.paper_collector import collect_papers_for_all_users
-                success_count, total_count, errors = collect_papers_for_all_users()
+                from src.config import settings
+                from src.core.paper_collector import collect_papers_in_parallel
+                shard = args.shard or settings_shard(parser)
+                success_count, total_count, errors = collect_papers_in_parallel(
+                    args.workers or settings.COLLECT_WORKERS, engine=args.engine, shard=shard)
                 
                 print(f"为用户执行论文收集：成功 {success_count}/{total_count} 个用户")
                 if errors:
@@ -90,6 +129,67 @@ def main():
                     print(f"为用户 {user.email} 收集失败: {message}")
             else:
                 print("错误：需要指定用户ID或为所有用户收集论文")
+    elif args.command == 'send-queue':
+        # 创建应用上下文
+        from src.app import create_app
+        app = create_app()
+        
+        with app.app_context():
+            from src.core.outbox import send_outbox, prune_outbox
+            stats = send_outbox(max_workers=args.workers, limit=args.limit)
+            print(f"发件箱：发送成功 {stats['sent']} 封，等待重试 {stats['retry']} 封，放弃 {stats['failed']} 封")
+            pruned = prune_outbox()
+            if pruned:
+                print(f"已清理 {pruned} 封超过保留期的邮件")
+    
+    elif args.command == 'warm-up':
+        # 创建应用上下文
+        from src.app import create_app
+        app = create_app()
+        
+        with app.app_context():
+            from datetime import timedelta
+            from src.config import settings
+            from src.core.paper_collector import warm_up_sources
+            from src.core.send_schedule import current_window
+            
+            # 在单独的进程中预热时，结果通过磁盘上的arXiv结果缓存和订阅源状态供之后的收集复用
+            minutes = settings.SCHEDULER_PREFETCH_MINUTES if args.minutes is None else args.minutes
+            window = tuple(moment + timedelta(minutes=minutes) for moment in current_window())
+            cache = warm_up_sources(window, shard=settings_shard(parser))
+            print(f"预热完成：{len(cache)} 个来源")
+    
+    elif args.command == 'scheduler':
+        import signal
+        import threading
+        from src.app import create_app
+        # 每次投递都会使用分片配置，启动前先检查
+        settings_shard(parser)
+        app = create_app()
+        
+        # 收到终止信号后在当前任务完成时退出
+        stop_event = threading.Event()
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(signum, lambda *_: stop_event.set())
+        
+        with app.app_context():
+            from src.core.scheduler import DeliveryScheduler
+            DeliveryScheduler().run(stop_event)
+    
+    elif args.command == 'hosts':
+        from src.core.host_guard import get_host_guard
+        guard = get_host_guard()
+        
+        if args.reset is not None:
+            guard.reset(args.reset or None)
+            print(f"已关闭 {args.reset or '全部主机'} 的熔断")
+        else:
+            circuits = guard.open_circuits()
+            if not circuits:
+                print("没有处于熔断状态的主机")
+            for host, info in sorted(circuits.items()):
+                print(f"{host}: 连续失败 {info['failures']} 次，{info['retry_in']:.0f} 秒后重试；最近的错误: {info['error']}")
+    
     elif args.command == 'init-db':
         # 初始化数据库
         from src.app import create_app
@@ -109,8 +209,10 @@ def main():
                 db.drop_all()
                 print("所有表已删除")
             
-            # 创建表
+            # 创建表，并升级已有的表结构
+            from src.migrations import upgrade_database
             db.create_all()
+            upgrade_database(db)
             print("数据库初始化完成")
     
     else:
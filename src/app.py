@@ -10,6 +10,7 @@ from flask_login import LoginManager
 from datetime import datetime
 
 from .models import db, User
+from .migrations import upgrade_database
 from .routes import auth_bp, user_bp, main_bp
 
 def create_app(test_config=None):
@@ -58,8 +59,9 @@ def create_app(test_config=None):
             current_user.last_seen = datetime.utcnow()
             db.session.commit()
     
-    # 使用APP上下文初始化数据库
+    # 使用APP上下文初始化数据库，并升级已有的表结构
     with app.app_context():
         db.create_all()
+        upgrade_database(db)
     
     return app 
\ No newline at end of file
@@ -30,10 +30,84 @@ os.makedirs(OUTPUT_FOLDER, exist_ok=True)
 
 # arXiv API配置
 ARXIV_API_URL = "http://export.arxiv.org/api/query"
+# 每个关键词保留的最新论文数
+ARXIV_RESULTS_PER_KEYWORD = int(os.environ.get('ARXIV_RESULTS_PER_KEYWORD', 5))
+# 合并到同一次检索中的关键词数
+ARXIV_KEYWORDS_PER_QUERY = int(os.environ.get('ARXIV_KEYWORDS_PER_QUERY', 10))
+# 每页结果数，以及一次合并检索最多翻的页数
+ARXIV_PAGE_SIZE = int(os.environ.get('ARXIV_PAGE_SIZE', 100))
+ARXIV_MAX_PAGES = int(os.environ.get('ARXIV_MAX_PAGES', 3))
+# 相邻两次arXiv请求的最小间隔（秒），arXiv要求客户端限速
+ARXIV_REQUEST_INTERVAL = float(os.environ.get('ARXIV_REQUEST_INTERVAL', 3))
+# arXiv检索结果缓存：过期时间（秒）、内存中保留的关键词数、是否启用磁盘缓存
+ARXIV_CACHE_TTL = float(os.environ.get('ARXIV_CACHE_TTL', 6 * 3600))
+ARXIV_CACHE_SIZE = int(os.environ.get('ARXIV_CACHE_SIZE', 2048))
+ARXIV_CACHE_DISK = os.environ.get('ARXIV_CACHE_DISK', 'True').lower() in ('true', '1', 't')
+ARXIV_CACHE_DB = os.path.join(DATA_DIR, 'arxiv_cache.db')
 
 # TechRxiv API配置
 TECHRXIV_API_URL = "https://www.techrxiv.org/feed/rss_2.0/recent"
 
+# 抓取并发配置
+# 单个用户的订阅源并发抓取的线程数
+FETCH_MAX_WORKERS = int(os.environ.get('FETCH_MAX_WORKERS', 8))
+
+# HTTP客户端配置
+# 下载订阅源时使用的User-Agent
+HTTP_USER_AGENT = os.environ.get('HTTP_USER_AGENT', 'Mozilla/5.0 (compatible; PaperCollector/2.0)')
+# 连接超时和读取超时（秒）
+HTTP_CONNECT_TIMEOUT = float(os.environ.get('HTTP_CONNECT_TIMEOUT', 10))
+HTTP_READ_TIMEOUT = float(os.environ.get('HTTP_READ_TIMEOUT', 30))
+# 遇到5xx/429时的最大重试次数，以及指数退避的基数（秒）
+HTTP_MAX_RETRIES = int(os.environ.get('HTTP_MAX_RETRIES', 3))
+HTTP_BACKOFF_FACTOR = float(os.environ.get('HTTP_BACKOFF_FACTOR', 1.0))
+# 单个订阅源从开始抓取起允许的最长时间（秒），超时后放弃该源的结果；
+# 默认为一次请求的全部尝试都超时的耗时：(连接超时 + 读取超时) × 尝试次数，加上各次重试前的退避等待
+FETCH_TIMEOUT = float(os.environ.get('FETCH_TIMEOUT') or
+                      (HTTP_CONNECT_TIMEOUT + HTTP_READ_TIMEOUT) * (HTTP_MAX_RETRIES + 1)
+                      + HTTP_BACKOFF_FACTOR * (2 ** HTTP_MAX_RETRIES - 1))
+# 连接池缓存的主机数，以及每个主机保持的连接数
+HTTP_POOL_CONNECTIONS = int(os.environ.get('HTTP_POOL_CONNECTIONS', 32))
+HTTP_POOL_MAXSIZE = int(os.environ.get('HTTP_POOL_MAXSIZE', FETCH_MAX_WORKERS))
+
+# 按主机限流：每个主机每秒的请求数（0表示不限）和允许的突发请求数
+HOST_RATE_LIMIT = float(os.environ.get('HOST_RATE_LIMIT', 5))
+HOST_BURST = int(os.environ.get('HOST_BURST', 10))
+# 个别主机的限速，格式为 "主机=每秒请求数,..."；arXiv默认按 ARXIV_REQUEST_INTERVAL 限速
+HOST_RATE_LIMITS = os.environ.get('HOST_RATE_LIMITS', '')
+# 按主机熔断：连续失败多少次后熔断，以及熔断的冷却时间（秒）
+HOST_FAILURE_THRESHOLD = int(os.environ.get('HOST_FAILURE_THRESHOLD', 5))
+HOST_COOLDOWN = float(os.environ.get('HOST_COOLDOWN', 600))
+# 主机熔断状态，跨运行保留
+HOST_STATE_DB = os.path.join(DATA_DIR, 'host_state.db')
+
+# 订阅源状态存储（ETag / Last-Modified / 内容哈希），用于跨运行的条件请求
+FEED_STATE_DB = os.path.join(DATA_DIR, 'feed_state.db')
+# 超过该天数未访问的订阅源状态将被清理
+FEED_STATE_RETENTION_DAYS = int(os.environ.get('FEED_STATE_RETENTION_DAYS', 30))
+
+# 批量收集引擎：thread（线程池）或 async（asyncio事件循环）
+COLLECT_ENGINE = os.environ.get('COLLECT_ENGINE', 'thread')
+# async引擎的全局并发请求上限
+ASYNC_MAX_CONCURRENCY = int(os.environ.get('ASYNC_MAX_CONCURRENCY', 200))
+# async引擎对单个主机的并发请求上限
+ASYNC_PER_HOST_LIMIT = int(os.environ.get('ASYNC_PER_HOST_LIMIT', 4))
+# 批量收集的并行进程数；大于1时用户按ID分片，由多个进程同时处理
+COLLECT_WORKERS = int(os.environ.get('COLLECT_WORKERS', 1))
+# 本实例处理的用户分片，格式为 "i/N"（i从1开始），为空时处理全部用户；
+# 用于在多个定时任务容器之间分摊用户
+COLLECT_SHARD = os.environ.get('COLLECT_SHARD', '')
+
+# 投递调度器（run.py scheduler）配置
+# 在发送时间之前多少分钟预热该时间用户的订阅源和arXiv检索
+SCHEDULER_PREFETCH_MINUTES = int(os.environ.get('SCHEDULER_PREFETCH_MINUTES', 5))
+# 重启后最多补发多少分钟内错过的发送时间
+SCHEDULER_CATCH_UP_MINUTES = int(os.environ.get('SCHEDULER_CATCH_UP_MINUTES', 360))
+# 重新读取用户发送时间的间隔（秒）
+SCHEDULER_REFRESH_SECONDS = float(os.environ.get('SCHEDULER_REFRESH_SECONDS', 60))
+# 记录最近一次投递时刻的状态文件
+SCHEDULER_STATE_FILE = os.path.join(DATA_DIR, 'scheduler_state.json')
+
 # 邮件配置 - 从环境变量读取
 SENDER_EMAIL = os.environ.get('SENDER_EMAIL')
 if not SENDER_EMAIL:
@@ -43,6 +117,22 @@ if not SENDER_EMAIL:
 SMTP_SERVER = os.environ.get('SMTP_SERVER')
 SMTP_PORT = int(os.environ.get('SMTP_PORT', 465))
 SMTP_USE_SSL = os.environ.get('SMTP_USE_SSL', 'True').lower() in ('true', '1', 't')
+# SMTP连接超时（秒）
+SMTP_TIMEOUT = float(os.environ.get('SMTP_TIMEOUT', 30))
+# 批量发送时同时保持的SMTP连接数，以及每个连接最多发送的邮件数（达到后重新连接）
+SMTP_POOL_SIZE = int(os.environ.get('SMTP_POOL_SIZE', 2))
+SMTP_MAX_MESSAGES_PER_CONNECTION = int(os.environ.get('SMTP_MAX_MESSAGES_PER_CONNECTION', 100))
+# 邮件投递方式：inline 收集后立即发送（失败的邮件留在发件箱等待重试）；
+# queue 收集时只写入发件箱，由 run.py send-queue 发送
+EMAIL_DELIVERY = os.environ.get('EMAIL_DELIVERY', 'inline')
+# send-queue 的并发发送数、每封邮件的最大尝试次数、重试的基础间隔（秒）
+EMAIL_SEND_WORKERS = int(os.environ.get('EMAIL_SEND_WORKERS', 4))
+EMAIL_MAX_ATTEMPTS = int(os.environ.get('EMAIL_MAX_ATTEMPTS', 5))
+EMAIL_RETRY_DELAY = float(os.environ.get('EMAIL_RETRY_DELAY', 300))
+# 领取后超过该时间（秒）仍未完成的邮件视为发送进程已崩溃，可以重新领取
+EMAIL_CLAIM_TIMEOUT = float(os.environ.get('EMAIL_CLAIM_TIMEOUT', 600))
+# 已发送和已放弃的邮件在发件箱中保留的天数，send-queue 运行时清理
+EMAIL_OUTBOX_RETENTION_DAYS = int(os.environ.get('EMAIL_OUTBOX_RETENTION_DAYS', 30))
 
 if not SMTP_SERVER:
     logger.warning("SMTP_SERVER 未在环境变量中设置")
@@ -65,6 +155,8 @@ PERMANENT_SESSION_LIFETIME = timedelta(days=7)
 # 数据库配置
 SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL', f'sqlite:///{os.path.join(DATA_DIR, "paper_collector.db")}')
 SQLALCHEMY_TRACK_MODIFICATIONS = False
+# 批量写入已发送论文记录时每批的行数
+SENT_PAPER_BATCH_SIZE = int(os.environ.get('SENT_PAPER_BATCH_SIZE', 500))
 
 # 邮件密码 - 从环境变量读取
 SENDER_PASSWORD = os.environ.get('PAPER_COLLECTOR_PASSWORD')
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+# arXiv检索结果缓存模块
+# 以 (规范化关键词, 提交日期窗口) 为键缓存每个关键词的检索结果，带过期时间：
+# 进程内为LRU缓存，另有可选的SQLite磁盘层（settings.DATA_DIR下），
+# 使Web手动触发、run.py collect和定时任务之间可以共享结果
+
+import json
+import time
+import sqlite3
+import logging
+import threading
+from collections import OrderedDict
+
+from src.config import settings
+
+logger = logging.getLogger(__name__)
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_arxiv_cache():
+    """获取进程内共享的arXiv结果缓存"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ArxivResultCache(
+                ttl=settings.ARXIV_CACHE_TTL,
+                max_entries=settings.ARXIV_CACHE_SIZE,
+                path=settings.ARXIV_CACHE_DB if settings.ARXIV_CACHE_DISK else None,
+            )
+        return _cache
+
+
+class ArxivResultCache:
+    """两级（内存LRU + 可选SQLite）的arXiv检索结果缓存"""
+
+    def __init__(self, ttl, max_entries, path=None):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        self._conn = None
+        if path:
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS arxiv_results (
+                    keyword TEXT NOT NULL,
+                    window TEXT NOT NULL,
+                    entries TEXT NOT NULL,
+                    fetched_at REAL NOT NULL,
+                    PRIMARY KEY (keyword, window)
+                )
+            """)
+            # 清理已过期的结果
+            self._conn.execute("DELETE FROM arxiv_results WHERE fetched_at < ?", (time.time() - ttl,))
+            self._conn.commit()
+
+    def get(self, keyword, window):
+        """
+        读取缓存的检索结果
+
+        参数:
+            keyword: 规范化关键词
+            window: 提交日期窗口的起始日期
+
+        返回:
+            list: 条目列表；未命中或已过期时返回None
+        """
+        key = (keyword, window)
+        now = time.time()
+        with self._lock:
+            cached = self._memory.get(key)
+            if cached and now - cached[0] < self.ttl:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return cached[1]
+
+            if self._conn is not None:
+                row = self._conn.execute(
+                    "SELECT entries, fetched_at FROM arxiv_results WHERE keyword = ? AND window = ?",
+                    key
+                ).fetchone()
+                if row and now - row[1] < self.ttl:
+                    entries = [tuple(entry) for entry in json.loads(row[0])]
+                    self._remember(key, row[1], entries)
+                    self.disk_hits += 1
+                    return entries
+
+            self.misses += 1
+            return None
+
+    def put(self, keyword, window, entries):
+        """写入一个关键词的检索结果"""
+        key = (keyword, window)
+        now = time.time()
+        with self._lock:
+            self._remember(key, now, entries)
+            if self._conn is not None:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO arxiv_results (keyword, window, entries, fetched_at) "
+                    "VALUES (?, ?, ?, ?)",
+                    (keyword, window, json.dumps(entries, ensure_ascii=False), now)
+                )
+                self._conn.commit()
+
+    def _remember(self, key, fetched_at, entries):
+        self._memory[key] = (fetched_at, entries)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def stats(self):
+        """
+        返回命中率统计
+
+        返回:
+            dict: {'memory_hits', 'disk_hits', 'misses', 'hit_rate'}
+        """
+        with self._lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            return {
+                'memory_hits': self.memory_hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'hit_rate': (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+            }
+
+    def log_stats(self):
+        """将命中率统计写入日志"""
+        stats = self.stats()
+        logger.info(
+            f"arXiv结果缓存：内存命中 {stats['memory_hits']} 次，磁盘命中 {stats['disk_hits']} 次，"
+            f"未命中 {stats['misses']} 次，命中率 {stats['hit_rate']:.1%}（TTL {self.ttl:g} 秒）"
+        )
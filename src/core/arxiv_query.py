@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+# arXiv检索规划模块
+# 将多个关键词合并为少量 all:"a" OR all:"b" 形式的检索，按 start/max_results 翻页，
+# 再在本地把返回的论文归属到匹配的关键词，减少对arXiv API的请求次数；
+# 翻页达到上限后仍结果不足的关键词（被同批次的热门关键词挤占）去掉热门关键词后重新合并检索，
+# 仍不足时继续拆分，只剩一个关键词时才单独检索；
+# 请求间隔由 http_client 中按主机的限流保证（arXiv主机按 ARXIV_REQUEST_INTERVAL 限速）
+
+import logging
+from datetime import datetime, timedelta
+
+import requests
+
+from src.config import settings
+from src.core.fetch_cache import normalize_keyword
+from src.core.keyword_matcher import get_matcher
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_arxiv_keyword(keyword):
+    """规范化arXiv检索关键词；引号会破坏短语检索，统一去掉"""
+    return normalize_keyword(keyword.replace('"', ' '))
+
+
+def plan_arxiv_queries(keywords, batch_size=None):
+    """
+    将关键词规划为若干批次，每批合并为一次检索
+
+    参数:
+        keywords: 关键词列表
+        batch_size: 每次检索包含的关键词数，默认使用 settings.ARXIV_KEYWORDS_PER_QUERY
+
+    返回:
+        list: 规范化关键词的批次列表 [[kw, ...], ...]，顺序稳定
+    """
+    batch_size = batch_size or settings.ARXIV_KEYWORDS_PER_QUERY
+    normalized = sorted({normalize_arxiv_keyword(kw) for kw in keywords} - {''})
+    return [normalized[i:i + batch_size] for i in range(0, len(normalized), batch_size)]
+
+
+def arxiv_date_window():
+    """检索的提交日期窗口起点：90天前的日期（YYYYMMDD）"""
+    return (datetime.now() - timedelta(days=90)).strftime('%Y%m%d')
+
+
+def build_arxiv_batch_url(keywords, start=0, max_results=None):
+    """
+    构建合并检索的完整URL
+    限制为最近90天内的提交，按提交日期倒序
+    """
+    since = arxiv_date_window()
+    terms = ' OR '.join(f'all:"{kw}"' for kw in keywords)
+
+    params = {
+        'search_query': f'({terms}) AND submittedDate:[{since}0000 TO *]',
+        'start': start,
+        'max_results': max_results or settings.ARXIV_PAGE_SIZE,
+        'sortBy': 'submittedDate',  # 按提交日期排序
+        'sortOrder': 'descending'  # 显示最新论文
+    }
+    return requests.Request('GET', settings.ARXIV_API_URL, params=params).prepare().url
+
+
+def attribute_entries(entries, keywords):
+    """
+    将论文归属到标题或摘要中出现的关键词
+
+    参数:
+        entries: 条目列表 [(title, summary, link, published), ...]
+        keywords: 规范化关键词列表
+
+    返回:
+        dict: {关键词: [条目, ...]}，保持条目原有顺序
+    """
+    matcher = get_matcher(keywords)
+    attributed = {kw: [] for kw in keywords}
+    for entry in entries:
+        # arXiv的标题和摘要中常有换行和连续空格，先压缩空白
+        text = ' '.join(f"{entry[0]} {entry[1] or ''}".lower().split())
+        for kw in matcher.match_text(text):
+            attributed[kw].append(entry)
+    return attributed
+
+
+def fetch_arxiv_batch(keywords, load):
+    """
+    执行一批关键词的合并检索，翻页直到每个关键词都有足够的结果
+    翻页达到 settings.ARXIV_MAX_PAGES 后仍不足的关键词去掉结果已足够的关键词，重新合并检索；
+    全部关键词都不足时对半拆分，只剩一个关键词时不再拆分
+
+    参数:
+        keywords: 规范化关键词列表（一个批次）
+        load: 下载并解析URL的函数，返回条目列表
+
+    返回:
+        dict: {关键词: [条目, ...]}，每个关键词最多 settings.ARXIV_RESULTS_PER_KEYWORD 篇
+    """
+    per_keyword = settings.ARXIV_RESULTS_PER_KEYWORD
+    page_size = settings.ARXIV_PAGE_SIZE
+    entries = []
+    attributed = {kw: [] for kw in keywords}
+
+    exhausted = False
+    for page in range(settings.ARXIV_MAX_PAGES):
+        page_entries = load(build_arxiv_batch_url(keywords, start=page * page_size, max_results=page_size))
+        entries.extend(page_entries)
+
+        attributed = attribute_entries(entries, keywords)
+        exhausted = len(page_entries) < page_size
+        if exhausted or all(len(found) >= per_keyword for found in attributed.values()):
+            break
+
+    # 合并检索的结果已全部取回时，结果不足说明该关键词确实没有更多论文
+    starved = [] if exhausted else [kw for kw, found in attributed.items() if len(found) < per_keyword]
+    if starved and len(keywords) > 1:
+        if len(starved) < len(keywords):
+            groups = [starved]
+        else:
+            middle = len(keywords) // 2
+            groups = [keywords[:middle], keywords[middle:]]
+        logger.info(f"关键词 {starved} 在合并检索中结果不足，拆分为 {groups} 重新检索")
+        for group in groups:
+            for kw, own in fetch_arxiv_batch(group, load).items():
+                links = {entry[2] for entry in own}
+                attributed[kw] = own + [entry for entry in attributed[kw] if entry[2] not in links]
+
+    return {kw: found[:per_keyword] for kw, found in attributed.items()}
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+# 异步抓取引擎模块
+# 在一个事件循环中并发下载批量运行涉及的全部订阅源，
+# 受全局并发上限和单主机并发上限约束；解析放在线程池中进行，不阻塞事件循环
+# 与同步路径一样发送条件请求，未变化的来源复用上次的解析结果
+
+import time
+import asyncio
+import logging
+import collections
+import concurrent.futures
+
+from src.config import settings
+from src.core.http_client import RETRY_STATUSES, backoff_delay, default_headers, metrics
+from src.core.host_guard import get_host_guard, url_host
+
+logger = logging.getLogger(__name__)
+
+# 请求尚未得到结果
+_UNFINISHED = object()
+
+
+def _connection_tracer():
+    """记录请求是否已与主机建立连接（新建连接或复用连接池中的连接）"""
+    import aiohttp
+
+    async def on_connected(session, context, params):
+        if context.trace_request_ctx is not None:
+            context.trace_request_ctx['connected'] = True
+
+    tracer = aiohttp.TraceConfig()
+    tracer.on_connection_create_end.append(on_connected)
+    tracer.on_connection_reuseconn.append(on_connected)
+    return tracer
+
+
+async def _download(session, url, headers, timeout):
+    """
+    下载单个订阅源，返回 (状态码, 响应头, 响应内容)
+    遇到5xx/429时按与同步客户端相同的策略退避重试，并与同步客户端共用主机限流与熔断；
+    timeout 从限流等待结束后开始计时，包含重试
+    """
+    import aiohttp
+    from yarl import URL
+
+    guard = get_host_guard()
+    delay = guard.acquire(url)
+    if delay > 0:
+        await asyncio.sleep(delay)
+    start = time.monotonic()
+    # 由 _connection_tracer 的回调设置，区分请求是否已到达主机
+    trace = {'connected': False}
+    # 请求的结果：None表示成功，否则为失败原因；在finally中记录到熔断器，请求被取消时只结束试探请求
+    outcome = _UNFINISHED
+
+    async def request():
+        nonlocal outcome
+        attempt = 0
+        while True:
+            # URL已按requests的规则编码，这里不再重复编码
+            async with session.get(URL(url, encoded=True), headers=headers, trace_request_ctx=trace) as response:
+                content = await response.read()
+                status = response.status
+                if status in RETRY_STATUSES and attempt < settings.HTTP_MAX_RETRIES:
+                    attempt += 1
+                    await asyncio.sleep(backoff_delay(attempt))
+                    continue
+                metrics.record(url, len(content), time.monotonic() - start, failed=status >= 400)
+                outcome = f"HTTP {status}" if status in RETRY_STATUSES else None
+                if status != 304:
+                    response.raise_for_status()
+                return status, response.headers, content
+
+    try:
+        return await asyncio.wait_for(request(), timeout)
+    except aiohttp.ClientError as e:
+        # 连接错误和 sock_connect/sock_read 超时都是主机的失败
+        if outcome is _UNFINISHED:
+            metrics.record(url, 0, time.monotonic() - start, failed=True)
+            outcome = str(e) or type(e).__name__
+        raise
+    except asyncio.TimeoutError:
+        # 整体超时：只有已与主机建立连接的请求计为主机的失败，还没有取得连接时只结束试探请求
+        metrics.record(url, 0, time.monotonic() - start, failed=True)
+        error = f"请求 {url} 超过 {timeout:g} 秒未完成"
+        if outcome is _UNFINISHED and trace['connected']:
+            outcome = error
+        raise asyncio.TimeoutError(error) from None
+    finally:
+        if outcome is _UNFINISHED:
+            guard.release(url)
+        elif outcome is None:
+            guard.record_success(url)
+        else:
+            guard.record_failure(url, outcome)
+
+
+async def _prefetch(sources, cache, parse, store, max_concurrency, per_host_limit, timeout):
+    import aiohttp
+
+    loop = asyncio.get_running_loop()
+    connector = aiohttp.TCPConnector(limit=max_concurrency, limit_per_host=per_host_limit)
+    # 不设置总超时：aiohttp的总超时包含排队等待连接的时间，整个请求的超时由 _download 在取得并发名额后计时
+    client_timeout = aiohttp.ClientTimeout(
+        total=None,
+        sock_connect=settings.HTTP_CONNECT_TIMEOUT,
+        sock_read=settings.HTTP_READ_TIMEOUT,
+    )
+    parse_executor = concurrent.futures.ThreadPoolExecutor(max_workers=settings.FETCH_MAX_WORKERS)
+    slots = asyncio.Semaphore(max_concurrency)
+    host_slots = collections.defaultdict(lambda: asyncio.Semaphore(per_host_limit))
+
+    async def fetch_one(session, key, url):
+        try:
+            headers = default_headers()
+            headers.update(store.request_headers(url))
+            # 先取得主机的名额再占用全局名额，等待同一主机时不阻塞其他主机
+            async with host_slots[url_host(url)], slots:
+                status, response_headers, content = await _download(session, url, headers, timeout)
+            entries = await loop.run_in_executor(
+                parse_executor, store.resolve, url, status, response_headers, content, parse
+            )
+            cache.put(key, entries)
+        except Exception as e:
+            logger.error(f"异步抓取 {url} 时出错: {e}")
+            cache.put_error(key, e)
+
+    try:
+        async with aiohttp.ClientSession(connector=connector, timeout=client_timeout,
+                                         trace_configs=[_connection_tracer()]) as session:
+            await asyncio.gather(*(
+                fetch_one(session, key, url) for key, url in sources.items()
+            ))
+    finally:
+        parse_executor.shutdown(wait=True)
+
+
+def prefetch_sources(sources, cache, parse, store, max_concurrency=None, per_host_limit=None, timeout=None):
+    """
+    在一个事件循环中并发下载全部来源，并将解析结果写入抓取缓存
+
+    参数:
+        sources: {缓存键: 下载URL}
+        cache: FetchCache对象
+        parse: 解析函数，接收下载内容，返回条目列表
+        store: FeedStateStore对象，用于条件请求和跳过未变化内容的解析
+        max_concurrency: 全局并发请求上限，默认使用 settings.ASYNC_MAX_CONCURRENCY
+        per_host_limit: 单个主机的并发请求上限，默认使用 settings.ASYNC_PER_HOST_LIMIT
+        timeout: 单个请求的超时时间（秒），从取得并发名额并通过限流后开始计时，默认使用 settings.FETCH_TIMEOUT
+    """
+    sources = {key: url for key, url in sources.items() if key not in cache}
+    if not sources:
+        return
+
+    asyncio.run(_prefetch(
+        sources, cache, parse, store,
+        max_concurrency or settings.ASYNC_MAX_CONCURRENCY,
+        per_host_limit or settings.ASYNC_PER_HOST_LIMIT,
+        timeout or settings.FETCH_TIMEOUT,
+    ))
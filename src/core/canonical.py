@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+# 论文身份规范化模块
+# 同一篇预印本可能以不同的URL出现在arXiv API、arXiv RSS、TechRxiv和期刊订阅源中
+# （abs与pdf、http与https、版本号后缀等），这里为论文计算与来源无关的身份键：
+#   canonical_key: arXiv编号 > DOI > 规范化URL
+#   title_key:     规范化标题的哈希，用于识别跨来源的同一篇论文
+
+import re
+import hashlib
+import unicodedata
+from functools import lru_cache
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode, unquote
+
+# 新格式 (2401.00001v2) 和旧格式 (hep-th/9901001v1) 的arXiv编号
+_ARXIV_ID = re.compile(r'(\d{4}\.\d{4,5}|[a-z][a-z\-]*(?:\.[a-z]{2})?/\d{7})(?:v\d+)?', re.IGNORECASE)
+# arXiv在DataCite注册的DOI：10.48550/arXiv.2401.00001
+_ARXIV_DOI = re.compile(r'^10\.48550/arxiv\.(.+)$', re.IGNORECASE)
+_DOI = re.compile(r'10\.\d{4,9}/[^\s?#&]+', re.IGNORECASE)
+# 规范化URL时去掉的跟踪参数
+_TRACKING_PARAMS = {'af', 'rss', 'fbclid', 'gclid', 'mc_cid', 'mc_eid'}
+# 标题过短（如"Editorial"）时不计算标题哈希，避免误判为同一篇论文
+_MIN_TITLE_WORDS = 4
+# 同一篇论文在一次运行中会被多个用户和来源重复计算身份键，缓存最近的结果
+_IDENTITY_CACHE_SIZE = 65536
+
+
+def extract_arxiv_id(link):
+    """从arXiv链接或arXiv DOI中提取不带版本号的arXiv编号，无法提取时返回None"""
+    if not link:
+        return None
+    parts = urlsplit(link.strip())
+    host = parts.netloc.lower()
+    if host.endswith('arxiv.org'):
+        path = unquote(parts.path)
+        for prefix in ('/abs/', '/pdf/', '/html/', '/format/'):
+            if path.startswith(prefix):
+                match = _ARXIV_ID.match(path[len(prefix):])
+                if match:
+                    return match.group(1).lower()
+        return None
+
+    doi = extract_doi(link)
+    if doi:
+        match = _ARXIV_DOI.match(doi)
+        if match:
+            id_match = _ARXIV_ID.match(match.group(1))
+            if id_match:
+                return id_match.group(1).lower()
+    return None
+
+
+def extract_doi(link):
+    """从链接中提取小写的DOI，无法提取时返回None"""
+    if not link:
+        return None
+    match = _DOI.search(unquote(link))
+    if not match:
+        return None
+    doi = match.group(0).rstrip('.,;)')
+    if doi.lower().endswith('.pdf'):
+        doi = doi[:-4]
+    return doi.lower()
+
+
+def normalize_url(link):
+    """
+    规范化论文链接
+    统一为https、主机名小写并去掉www.前缀，去掉默认端口、URL片段、跟踪参数和末尾斜杠
+    """
+    parts = urlsplit((link or '').strip())
+    host = parts.netloc.lower()
+    if host.startswith('www.'):
+        host = host[4:]
+    for port in (':80', ':443'):
+        if host.endswith(port):
+            host = host[:-len(port)]
+    query = urlencode(sorted(
+        (name, value) for name, value in parse_qsl(parts.query, keep_blank_values=True)
+        if name.lower() not in _TRACKING_PARAMS and not name.lower().startswith('utm_')
+    ))
+    path = parts.path.rstrip('/') or '/'
+    return urlunsplit(('https', host, path, query, ''))
+
+
+def title_key(title):
+    """规范化标题的哈希；标题过短时返回None"""
+    text = unicodedata.normalize('NFKC', title or '').lower()
+    words = re.findall(r'\w+', text)
+    if len(words) < _MIN_TITLE_WORDS:
+        return None
+    return 'title:' + hashlib.sha1(' '.join(words).encode('utf-8')).hexdigest()
+
+
+def canonical_key(link):
+    """论文的规范身份键：arXiv编号 > DOI > 规范化URL"""
+    arxiv_id = extract_arxiv_id(link)
+    if arxiv_id:
+        return f'arxiv:{arxiv_id}'
+    doi = extract_doi(link)
+    if doi:
+        return f'doi:{doi}'
+    return 'url:' + normalize_url(link)
+
+
+@lru_cache(maxsize=_IDENTITY_CACHE_SIZE)
+def paper_source(link):
+    """论文来源：arXiv论文统一记为arxiv，其余为链接的主机名"""
+    if extract_arxiv_id(link):
+        return 'arxiv'
+    return urlsplit(normalize_url(link)).netloc[:64] or None
+
+
+@lru_cache(maxsize=_IDENTITY_CACHE_SIZE)
+def paper_identity(title, link):
+    """
+    计算论文的身份键
+
+    返回:
+        tuple: (canonical_key, title_key)，title_key 可能为None
+    """
+    return canonical_key(link)[:256], title_key(title)
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+# 邮件渲染模块
+# 使用Flask的Jinja环境渲染 src/templates/email 下的模板：每个模板每个进程只编译一次，
+# 不含变量的头部（样式表）每个进程只渲染一次，论文片段逐篇渲染后用join拼接，
+# 渲染耗时与论文数成线性关系；标题、摘要和链接都会经过HTML转义，摘要截断为 SUMMARY_LENGTH 个字符
+
+from flask import current_app
+from markupsafe import Markup
+
+# 邮件中摘要显示的最大字符数
+SUMMARY_LENGTH = 250
+
+# 已编译的模板、已渲染的静态部分和模板中的宏
+_templates = {}
+_static_parts = {}
+
+
+def _template(name):
+    """获取已编译的模板"""
+    template = _templates.get(name)
+    if template is None:
+        template = _templates[name] = current_app.jinja_env.get_template(name)
+    return template
+
+
+def digest_head():
+    """邮件的静态头部（样式表）"""
+    head = _static_parts.get('head')
+    if head is None:
+        head = _static_parts['head'] = Markup(_template('email/digest_head.html').render())
+    return head
+
+
+def render_paper(paper):
+    """渲染一篇论文的HTML片段"""
+    macro = _static_parts.get('paper')
+    if macro is None:
+        # 直接调用模板中的宏，省去每篇论文创建一次模板上下文的开销
+        macro = _static_parts['paper'] = _template('email/paper.html').module.render_paper
+    summary = paper.summary
+    return macro(paper, summary[:SUMMARY_LENGTH], len(summary) > SUMMARY_LENGTH)
+
+
+def render_digest(username, count, fragments):
+    """
+    渲染完整的论文邮件
+
+    参数:
+        username: 收件用户名
+        count: 新论文数
+        fragments: 论文HTML片段的可迭代对象（已转义）
+
+    返回:
+        str: HTML正文
+    """
+    return _template('email/digest.html').render(
+        head=digest_head(),
+        username=username,
+        count=count,
+        papers_html=Markup(''.join(fragments)),
+    )
+
+
+class FragmentCache:
+    """
+    本次运行中已渲染的论文片段，按 canonical_key 在所有收件人之间共享
+    同一篇论文发送给多个用户时只渲染一次
+    """
+
+    def __init__(self):
+        self._fragments = {}
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._fragments)
+
+    def render(self, paper):
+        """返回论文的HTML片段，首次出现时渲染并缓存"""
+        fragment = self._fragments.get(paper.canonical_key)
+        if fragment is None:
+            self.misses += 1
+            fragment = self._fragments[paper.canonical_key] = render_paper(paper)
+        else:
+            self.hits += 1
+        return fragment
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+# 订阅源状态存储模块
+# 在 settings.DATA_DIR 下的SQLite文件中持久化每个订阅源的ETag、Last-Modified、
+# 内容哈希和上次解析的条目，用于跨运行的条件请求：
+# 服务器返回304或内容哈希未变时直接复用上次的条目，跳过解析
+
+import json
+import sqlite3
+import hashlib
+import logging
+import threading
+from datetime import datetime, timedelta
+
+from src.config import settings
+
+logger = logging.getLogger(__name__)
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_feed_state_store():
+    """获取进程内共享的订阅源状态存储"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = FeedStateStore(settings.FEED_STATE_DB)
+        return _store
+
+
+class FeedStateStore:
+    """基于SQLite的订阅源状态存储，可在多个线程间共享"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS feed_state (
+                url TEXT PRIMARY KEY,
+                etag TEXT,
+                last_modified TEXT,
+                content_hash TEXT,
+                entries TEXT,
+                checked_at TEXT
+            )
+        """)
+        # 清理长期未访问的记录（例如按日期变化的arXiv查询URL）
+        cutoff = datetime.utcnow() - timedelta(days=settings.FEED_STATE_RETENTION_DAYS)
+        self._conn.execute("DELETE FROM feed_state WHERE checked_at < ?", (cutoff.isoformat(),))
+        self._conn.commit()
+
+    def _get(self, url):
+        with self._lock:
+            return self._conn.execute(
+                "SELECT etag, last_modified, content_hash, entries FROM feed_state WHERE url = ?",
+                (url,)
+            ).fetchone()
+
+    def request_headers(self, url):
+        """返回条件请求头（If-None-Match / If-Modified-Since）"""
+        row = self._get(url)
+        headers = {}
+        if row:
+            etag, last_modified = row[0], row[1]
+            if etag:
+                headers['If-None-Match'] = etag
+            if last_modified:
+                headers['If-Modified-Since'] = last_modified
+        return headers
+
+    def resolve(self, url, status, headers, content, parse):
+        """
+        根据响应决定是否需要解析
+
+        参数:
+            url: 下载URL
+            status: HTTP状态码
+            headers: 响应头
+            content: 响应内容（bytes）
+            parse: 解析函数，接收内容，返回条目列表
+
+        返回:
+            list: 条目列表 [(title, summary, link, published), ...]
+        """
+        row = self._get(url)
+        now = datetime.utcnow().isoformat()
+        content_hash = None if status == 304 else hashlib.sha256(content).hexdigest()
+
+        # 304 未修改，或内容与上次完全相同：复用上次的解析结果
+        if row and row[3] is not None and (status == 304 or content_hash == row[2]):
+            with self._lock:
+                self._conn.execute(
+                    "UPDATE feed_state SET etag = COALESCE(?, etag), "
+                    "last_modified = COALESCE(?, last_modified), checked_at = ? WHERE url = ?",
+                    (headers.get('ETag'), headers.get('Last-Modified'), now, url)
+                )
+                self._conn.commit()
+            logger.debug(f"订阅源 {url} 未变化，跳过解析")
+            return [tuple(entry) for entry in json.loads(row[3])]
+
+        if status == 304:
+            raise ValueError(f"订阅源 {url} 返回304，但没有可复用的缓存")
+
+        entries = parse(content)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO feed_state "
+                "(url, etag, last_modified, content_hash, entries, checked_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (url, headers.get('ETag'), headers.get('Last-Modified'),
+                 content_hash, json.dumps(entries, ensure_ascii=False), now)
+            )
+            self._conn.commit()
+        return entries
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+# 订阅源高水位模块
+# 每个订阅源的条目指纹只记录一次（feed_entries），附带首次出现的时间，由所有订阅者共享，
+# 已不在源中的条目随之删除；每个 (用户, 订阅源) 只记录上次成功处理的时间和当时用户关键词的指纹。
+# 首次出现不晚于该时间的条目已处理过，之后只对更新的条目做关键词匹配和去重查询；
+# 用户修改关键词后水位失效，整个订阅源重新处理。
+# 水位只用于减少重复处理，论文是否发送过仍以 user_papers 为准
+
+import hashlib
+
+from src.core.fetch_cache import normalize_keyword
+
+# 没有水位时已处理条目的空指纹集合
+NO_WATERMARK = frozenset()
+
+
+def entry_fingerprint(entry):
+    """条目 (title, summary, link, published) 的指纹，优先使用链接"""
+    title, _, link = entry[:3]
+    return hashlib.sha1((link or title or '').encode('utf-8')).hexdigest()[:16]
+
+
+def keywords_fingerprint(keywords):
+    """一组关键词的指纹，与顺序、大小写和多余空白无关"""
+    text = '\n'.join(sorted({normalize_keyword(kw) for kw in keywords}))
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()[:16]
+
+
+def load_watermarks(user_keywords):
+    """
+    批量读取一组用户的订阅源水位，只返回关键词未变化的水位
+
+    参数:
+        user_keywords: {用户ID: [关键词, ...]}
+
+    返回:
+        dict: {(用户ID, 规范化URL): 上次成功处理的时间}
+    """
+    from ..models import FeedWatermark
+    from .paper_store import chunks
+
+    expected = {user_id: keywords_fingerprint(keywords) for user_id, keywords in user_keywords.items()}
+    watermarks = {}
+    for chunk in chunks(expected):
+        for row in FeedWatermark.query.filter(FeedWatermark.user_id.in_(chunk)).all():
+            if row.keywords_hash == expected[row.user_id]:
+                watermarks[(row.user_id, row.source)] = row.processed_at
+    return watermarks
+
+
+def record_feed_entries(source, fingerprints, seen_at):
+    """
+    记录订阅源当前的条目并提交：新条目以 seen_at 作为首次出现的时间，已不在源中的条目被删除
+
+    参数:
+        source: 规范化的订阅源URL
+        fingerprints: 该源当前全部条目的指纹
+        seen_at: 本次运行开始的时间（UTC）
+
+    返回:
+        dict: {条目指纹: 首次出现的时间}
+    """
+    from ..models import FeedEntry, db
+    from .paper_store import chunks, insert_ignoring_duplicates
+
+    current = set(fingerprints)
+    db.session.execute(insert_ignoring_duplicates(FeedEntry.__table__), [
+        {'source': source, 'fingerprint': fingerprint, 'first_seen_at': seen_at} for fingerprint in current
+    ])
+    first_seen = dict(
+        db.session.query(FeedEntry.fingerprint, FeedEntry.first_seen_at).filter(FeedEntry.source == source).all()
+    )
+    stale = [fingerprint for fingerprint in first_seen if fingerprint not in current]
+    for chunk in chunks(stale):
+        FeedEntry.query.filter(FeedEntry.source == source, FeedEntry.fingerprint.in_(chunk)) \
+            .delete(synchronize_session=False)
+    db.session.commit()
+    return {fingerprint: first_seen[fingerprint] for fingerprint in current}
+
+
+def seen_entries(first_seen, processed_at):
+    """
+    用户已处理过的条目：首次出现不晚于上次成功处理时间的条目
+
+    参数:
+        first_seen: record_feed_entries 的返回值
+        processed_at: 用户该订阅源的水位，没有水位时为None
+
+    返回:
+        frozenset: 条目指纹
+    """
+    if processed_at is None:
+        return NO_WATERMARK
+    return frozenset(fingerprint for fingerprint, seen_at in first_seen.items() if seen_at <= processed_at)
+
+
+def save_watermarks(user_id, keywords, processed_sources, current_sources, processed_at):
+    """
+    在成功投递后更新用户的订阅源水位并提交
+
+    参数:
+        user_id: 用户ID
+        keywords: 用户本次使用的关键词
+        processed_sources: 本次已处理的规范化URL，未处理（下载失败或超时）的源不包含在内
+        current_sources: 用户当前订阅的全部规范化URL，不在其中的旧水位会被删除
+        processed_at: 本次运行开始的时间（UTC），与 record_feed_entries 的 seen_at 相同
+    """
+    from ..models import FeedEntry, FeedWatermark, db
+
+    keywords_hash = keywords_fingerprint(keywords)
+    existing = {row.source: row for row in FeedWatermark.query.filter_by(user_id=user_id).all()}
+    removed = [source for source in existing if source not in current_sources]
+    for source in removed:
+        db.session.delete(existing[source])
+
+    for source in processed_sources:
+        row = existing.get(source)
+        if row is None:
+            row = FeedWatermark(user_id=user_id, source=source)
+            db.session.add(row)
+        row.keywords_hash = keywords_hash
+        row.processed_at = processed_at
+    db.session.flush()
+
+    # 不再有任何用户订阅的源，删除其条目记录
+    for source in removed:
+        if not FeedWatermark.query.filter_by(source=source).first():
+            FeedEntry.query.filter_by(source=source).delete(synchronize_session=False)
+    db.session.commit()
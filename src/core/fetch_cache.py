@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+# 订阅源抓取缓存模块
+# 在一次收集运行内，每个不同的订阅源（RSS URL / arXiv查询）只下载、解析一次，
+# 解析结果供所有用户的关键词筛选共享
+
+import threading
+from urllib.parse import urlsplit, urlunsplit
+
+# 各协议的默认端口，规范化时去掉
+_DEFAULT_PORTS = {'http': '80', 'https': '443'}
+
+
+def normalize_feed_url(url):
+    """
+    规范化订阅源URL，用作缓存键
+    协议和主机名转为小写，去掉默认端口和URL片段
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    netloc = parts.netloc.lower()
+    host, sep, port = netloc.rpartition(':')
+    if sep and _DEFAULT_PORTS.get(scheme) == port:
+        netloc = host
+    path = parts.path or '/'
+    return urlunsplit((scheme, netloc, path, parts.query, ''))
+
+
+def normalize_keyword(keyword):
+    """规范化关键词，用作arXiv查询的缓存键"""
+    return ' '.join(keyword.lower().split())
+
+
+class FetchCache:
+    """
+    单次运行内的订阅源抓取缓存
+
+    键为 (来源类型, 规范化URL或查询)，值为解析后的条目列表 [(title, summary, link, published), ...]。
+    下载失败也会被记录，同一次运行中不再重复请求该来源。
+    """
+
+    def __init__(self):
+        self._results = {}
+        self._errors = {}
+        self._key_locks = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _key_lock(self, key):
+        with self._lock:
+            return self._key_locks.setdefault(key, threading.Lock())
+
+    def get_or_fetch(self, key, loader):
+        """
+        获取缓存的条目，不存在时调用loader下载并解析
+
+        参数:
+            key: 缓存键
+            loader: 无参函数，返回条目列表
+
+        返回:
+            list: 条目列表
+        """
+        # 同一个键同时只允许一个线程下载，其余线程等待结果
+        with self._key_lock(key):
+            with self._lock:
+                if key in self._results:
+                    self.hits += 1
+                    return self._results[key]
+                if key in self._errors:
+                    self.hits += 1
+                    raise self._errors[key]
+                self.misses += 1
+
+            try:
+                entries = loader()
+            except Exception as e:
+                with self._lock:
+                    self._errors[key] = e
+                raise
+
+            with self._lock:
+                self._results[key] = entries
+            return entries
+
+    def get(self, key):
+        """
+        读取已缓存的条目
+        来源下载失败时抛出当时的错误，未缓存时抛出KeyError
+        """
+        with self._lock:
+            if key in self._errors:
+                self.hits += 1
+                raise self._errors[key]
+            entries = self._results[key]
+            self.hits += 1
+            return entries
+
+    def put(self, key, entries):
+        """直接写入已解析的条目"""
+        with self._lock:
+            self._results[key] = entries
+            self._errors.pop(key, None)
+
+    def put_error(self, key, error):
+        """记录来源的下载错误，本次运行中读取该来源时将抛出此错误"""
+        with self._lock:
+            self._errors[key] = error
+            self._results.pop(key, None)
+
+    def clear_errors(self):
+        """丢弃记录的下载错误，之后读取这些来源时重新下载"""
+        with self._lock:
+            self._errors.clear()
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._results or key in self._errors
+
+    def __len__(self):
+        with self._lock:
+            return len(self._results) + len(self._errors)
+
+    def stats(self):
+        """返回缓存统计信息"""
+        with self._lock:
+            return {
+                'sources': len(self._results) + len(self._errors),
+                'failed': len(self._errors),
+                'hits': self.hits,
+                'misses': self.misses,
+            }
@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+# 主机限流与熔断模块
+# 每个主机一个令牌桶，限制对同一出版商服务器的请求速率（arXiv按 ARXIV_REQUEST_INTERVAL 单独限速）；
+# 每个主机一个熔断器：连续失败 HOST_FAILURE_THRESHOLD 次后熔断，冷却 HOST_COOLDOWN 秒内
+# 对该主机的请求直接失败，冷却结束后放行一次试探请求，成功则恢复，失败则重新熔断。
+# 熔断状态保存在 settings.HOST_STATE_DB (SQLite) 中，跨运行和进程保留
+
+import time
+import sqlite3
+import logging
+import threading
+from datetime import datetime
+from urllib.parse import urlsplit
+
+import requests
+
+from src.config import settings
+
+logger = logging.getLogger(__name__)
+
+_guard = None
+_guard_lock = threading.Lock()
+
+
+class CircuitOpenError(requests.exceptions.RequestException):
+    """主机处于熔断状态，请求未发出"""
+
+
+def url_host(url):
+    """URL的主机部分（小写，含端口）"""
+    return urlsplit(url).netloc.lower()
+
+
+def parse_rate_limits(value):
+    """
+    解析 "主机=每秒请求数,..." 格式的单主机限速配置
+
+    返回:
+        dict: {主机: 每秒请求数}
+    """
+    limits = {}
+    for item in (value or '').split(','):
+        host, sep, rate = item.partition('=')
+        if not sep or not host.strip():
+            continue
+        try:
+            limits[host.strip().lower()] = float(rate)
+        except ValueError:
+            logger.error(f"忽略无效的主机限速配置: {item.strip()}")
+    return limits
+
+
+def get_host_guard():
+    """获取进程内共享的主机限流与熔断器"""
+    global _guard
+    with _guard_lock:
+        if _guard is None:
+            _guard = HostGuard(settings.HOST_STATE_DB)
+        return _guard
+
+
+class TokenBucket:
+    """
+    令牌桶，按预约方式取令牌：先扣除令牌，再由调用方等待返回的秒数，
+    同步和异步调用方都可以使用
+    """
+
+    def __init__(self, rate, burst):
+        """
+        参数:
+            rate: 每秒补充的令牌数，不大于0时不限速
+            burst: 桶容量（允许的突发请求数）
+        """
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+
+    def reserve(self):
+        """取一个令牌，返回发出请求前需要等待的秒数"""
+        if self.rate <= 0:
+            return 0.0
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= 1
+        return -self.tokens / self.rate if self.tokens < 0 else 0.0
+
+
+class HostGuard:
+    """
+    按主机的令牌桶限流与熔断器，可在多个线程间共享
+
+    熔断状态: 连续失败次数小于阈值时关闭；达到阈值后打开，直到冷却结束；
+    冷却结束后处于半开状态，同一时间只放行一个试探请求。
+    """
+
+    def __init__(self, path, failure_threshold=None, cooldown=None, rate=None, burst=None, rate_limits=None):
+        """
+        参数:
+            path: SQLite文件路径
+            failure_threshold: 熔断前允许的连续失败次数，默认使用 settings.HOST_FAILURE_THRESHOLD
+            cooldown: 熔断的冷却时间（秒），默认使用 settings.HOST_COOLDOWN
+            rate: 每个主机每秒的请求数，默认使用 settings.HOST_RATE_LIMIT
+            burst: 每个主机允许的突发请求数，默认使用 settings.HOST_BURST
+            rate_limits: {主机: 每秒请求数}，覆盖个别主机的限速，默认解析 settings.HOST_RATE_LIMITS
+        """
+        self.failure_threshold = failure_threshold or settings.HOST_FAILURE_THRESHOLD
+        self.cooldown = settings.HOST_COOLDOWN if cooldown is None else cooldown
+        self.rate = settings.HOST_RATE_LIMIT if rate is None else rate
+        self.burst = burst or settings.HOST_BURST
+        self.rate_limits = parse_rate_limits(settings.HOST_RATE_LIMITS) if rate_limits is None else dict(rate_limits)
+        # arXiv要求相邻请求间隔 ARXIV_REQUEST_INTERVAL 秒，不允许突发
+        arxiv_host = url_host(settings.ARXIV_API_URL)
+        if arxiv_host not in self.rate_limits and settings.ARXIV_REQUEST_INTERVAL > 0:
+            self.rate_limits[arxiv_host] = 1 / settings.ARXIV_REQUEST_INTERVAL
+
+        self._lock = threading.Lock()
+        self._buckets = {}
+        # {主机: {'failures', 'opened_until', 'probing', 'rejected', 'error'}}
+        self._hosts = {}
+
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS host_state (
+                host TEXT PRIMARY KEY,
+                failures INTEGER,
+                opened_until REAL,
+                last_error TEXT,
+                updated_at TEXT
+            )
+        """)
+        self._conn.commit()
+        for host, failures, opened_until, last_error in self._conn.execute(
+                "SELECT host, failures, opened_until, last_error FROM host_state"):
+            self._hosts[host] = self._new_state(failures, opened_until or 0.0, last_error)
+
+    @staticmethod
+    def _new_state(failures=0, opened_until=0.0, error=None):
+        return {'failures': failures, 'opened_until': opened_until, 'probing': False, 'rejected': 0, 'error': error}
+
+    def _bucket(self, host):
+        bucket = self._buckets.get(host)
+        if bucket is None:
+            rate = self.rate_limits.get(host, self.rate)
+            burst = 1 if host in self.rate_limits else self.burst
+            bucket = self._buckets[host] = TokenBucket(rate, burst)
+        return bucket
+
+    def _save(self, host, state):
+        """持久化主机状态；恢复正常的主机删除记录"""
+        if state['failures']:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO host_state (host, failures, opened_until, last_error, updated_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (host, state['failures'], state['opened_until'], state['error'], datetime.utcnow().isoformat())
+            )
+        else:
+            self._conn.execute("DELETE FROM host_state WHERE host = ?", (host,))
+        self._conn.commit()
+
+    def _reload(self, host, state):
+        """
+        重新读取熔断中主机的持久化状态，使 hosts --reset 和其他进程的结果生效
+
+        返回:
+            dict: 更新后的状态，记录已被删除（熔断已关闭）时返回None
+        """
+        row = self._conn.execute(
+            "SELECT failures, opened_until, last_error FROM host_state WHERE host = ?", (host,)
+        ).fetchone()
+        if row is None:
+            logger.info(f"主机 {host} 的熔断已在其他进程中关闭")
+            del self._hosts[host]
+            return None
+        state['failures'], state['opened_until'], state['error'] = row[0], row[1] or 0.0, row[2]
+        return state
+
+    def acquire(self, url):
+        """
+        请求前调用：检查主机的熔断状态并取一个令牌
+
+        返回:
+            float: 发出请求前需要等待的秒数
+
+        异常:
+            主机处于熔断状态时抛出 CircuitOpenError
+        """
+        host = url_host(url)
+        with self._lock:
+            state = self._hosts.get(host)
+            if state is not None and state['failures'] >= self.failure_threshold:
+                state = self._reload(host, state)
+            if state is not None and state['failures'] >= self.failure_threshold:
+                now = time.time()
+                if now < state['opened_until'] or state['probing']:
+                    state['rejected'] += 1
+                    retry_in = max(state['opened_until'] - now, 0)
+                    raise CircuitOpenError(f"主机 {host} 已熔断（连续失败 {state['failures']} 次），"
+                                           f"{retry_in:.0f} 秒后重试")
+                # 冷却结束，放行一个试探请求
+                state['probing'] = True
+                logger.info(f"主机 {host} 冷却结束，发送试探请求")
+            return self._bucket(host).reserve()
+
+    def wait(self, url):
+        """同步调用方使用：检查熔断状态，并等待到可以发出请求"""
+        delay = self.acquire(url)
+        if delay > 0:
+            time.sleep(delay)
+
+    def record_success(self, url):
+        """记录一次成功的请求，关闭主机的熔断器"""
+        host = url_host(url)
+        with self._lock:
+            state = self._hosts.pop(host, None)
+            if state is None:
+                return
+            if state['failures'] >= self.failure_threshold:
+                logger.info(f"主机 {host} 已恢复，关闭熔断")
+            self._save(host, self._new_state())
+
+    def release(self, url):
+        """请求没有得到结果（例如被取消）时调用：不计入成功或失败，只结束试探请求"""
+        host = url_host(url)
+        with self._lock:
+            state = self._hosts.get(host)
+            if state is not None:
+                state['probing'] = False
+
+    def record_failure(self, url, error):
+        """记录一次失败的请求（连接错误、超时或重试后仍为5xx/429），达到阈值时熔断"""
+        host = url_host(url)
+        with self._lock:
+            state = self._hosts.setdefault(host, self._new_state())
+            state['failures'] += 1
+            state['error'] = str(error)[:500]
+            if state['failures'] >= self.failure_threshold:
+                if state['probing'] or state['failures'] == self.failure_threshold:
+                    logger.error(f"主机 {host} 连续失败 {state['failures']} 次，熔断 {self.cooldown:g} 秒: {error}")
+                state['opened_until'] = time.time() + self.cooldown
+                state['probing'] = False
+            self._save(host, state)
+
+    def open_circuits(self):
+        """
+        返回当前处于熔断状态的主机
+
+        返回:
+            dict: {主机: {'failures', 'retry_in', 'rejected', 'error'}}，retry_in 为距冷却结束的秒数
+        """
+        now = time.time()
+        with self._lock:
+            return {
+                host: {
+                    'failures': state['failures'],
+                    'retry_in': max(state['opened_until'] - now, 0),
+                    'rejected': state['rejected'],
+                    'error': state['error'],
+                }
+                for host, state in self._hosts.items()
+                if state['failures'] >= self.failure_threshold
+            }
+
+    def reset(self, host=None):
+        """关闭指定主机（为空时为全部主机）的熔断器"""
+        with self._lock:
+            hosts = [host.lower()] if host else list(self._hosts)
+            for name in hosts:
+                self._hosts.pop(name, None)
+                self._conn.execute("DELETE FROM host_state WHERE host = ?", (name,))
+            self._conn.commit()
+
+    def log_stats(self):
+        """将处于熔断状态的主机写入日志"""
+        for host, info in sorted(self.open_circuits().items()):
+            logger.warning(
+                f"主机 {host} 处于熔断状态：连续失败 {info['failures']} 次，"
+                f"{info['retry_in']:.0f} 秒后重试，已跳过 {info['rejected']} 个请求；最近的错误: {info['error']}"
+            )
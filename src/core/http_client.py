@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+# HTTP客户端模块
+# 为所有抓取器提供共享的连接池会话：按主机复用连接、可配置的连接/读取超时、
+# 对5xx/429的有限次退避重试，并统计请求数、流量和耗时；
+# 每个请求都经过按主机的限流与熔断（见 host_guard）
+
+import time
+import logging
+import threading
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from src.config import settings
+from src.core.host_guard import get_host_guard
+
+logger = logging.getLogger(__name__)
+
+# 需要退避重试的HTTP状态码
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+_session = None
+_session_lock = threading.Lock()
+
+
+class HttpMetrics:
+    """HTTP请求统计，按主机累计请求数、失败数、下载字节数和耗时"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._hosts = {}
+
+    def record(self, url, nbytes, elapsed, failed=False):
+        """记录一次请求"""
+        host = urlsplit(url).netloc
+        with self._lock:
+            stats = self._hosts.setdefault(host, {'requests': 0, 'failed': 0, 'bytes': 0, 'seconds': 0.0})
+            stats['requests'] += 1
+            stats['bytes'] += nbytes
+            stats['seconds'] += elapsed
+            if failed:
+                stats['failed'] += 1
+
+    def snapshot(self):
+        """
+        返回统计快照
+
+        返回:
+            dict: {'requests', 'failed', 'bytes', 'seconds', 'hosts': {主机: 统计}}
+        """
+        with self._lock:
+            hosts = {host: dict(stats) for host, stats in self._hosts.items()}
+        total = {'requests': 0, 'failed': 0, 'bytes': 0, 'seconds': 0.0}
+        for stats in hosts.values():
+            for name in total:
+                total[name] += stats[name]
+        total['hosts'] = hosts
+        return total
+
+
+metrics = HttpMetrics()
+
+
+def default_headers():
+    """所有请求共用的请求头"""
+    return {'User-Agent': settings.HTTP_USER_AGENT}
+
+
+def backoff_delay(attempt):
+    """第attempt次重试（从1开始）前的等待时间（秒）"""
+    return settings.HTTP_BACKOFF_FACTOR * (2 ** (attempt - 1))
+
+
+def get_session():
+    """获取进程内共享的HTTP会话"""
+    global _session
+    with _session_lock:
+        if _session is None:
+            retry = Retry(
+                total=settings.HTTP_MAX_RETRIES,
+                backoff_factor=settings.HTTP_BACKOFF_FACTOR,
+                status_forcelist=RETRY_STATUSES,
+                allowed_methods=frozenset(['GET', 'HEAD']),
+                respect_retry_after_header=True,
+                raise_on_status=False,
+            )
+            adapter = HTTPAdapter(
+                pool_connections=settings.HTTP_POOL_CONNECTIONS,
+                pool_maxsize=settings.HTTP_POOL_MAXSIZE,
+                max_retries=retry,
+            )
+            session = requests.Session()
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            session.headers.update(default_headers())
+            _session = session
+        return _session
+
+
+def http_get(url, headers=None):
+    """
+    使用共享会话发起GET请求
+
+    参数:
+        url: 请求地址
+        headers: 额外的请求头，可选
+
+    返回:
+        requests.Response: 响应对象（未检查状态码）
+
+    异常:
+        主机处于熔断状态时抛出 CircuitOpenError，不发出请求
+    """
+    guard = get_host_guard()
+    guard.wait(url)
+    start = time.monotonic()
+    try:
+        response = get_session().get(
+            url, headers=headers,
+            timeout=(settings.HTTP_CONNECT_TIMEOUT, settings.HTTP_READ_TIMEOUT)
+        )
+    except requests.exceptions.RequestException as e:
+        metrics.record(url, 0, time.monotonic() - start, failed=True)
+        guard.record_failure(url, e)
+        raise
+    except BaseException:
+        guard.release(url)
+        raise
+
+    metrics.record(url, len(response.content), time.monotonic() - start,
+                   failed=response.status_code >= 400)
+    # 重试之后仍为5xx/429说明主机不可用；其他4xx只与单个订阅源有关
+    if response.status_code in RETRY_STATUSES:
+        guard.record_failure(url, f"HTTP {response.status_code}")
+    else:
+        guard.record_success(url)
+    return response
+
+
+def log_metrics():
+    """将当前的HTTP统计写入日志"""
+    stats = metrics.snapshot()
+    logger.info(
+        f"HTTP请求 {stats['requests']} 次（失败 {stats['failed']} 次），"
+        f"下载 {stats['bytes'] / 1024:.1f} KB，累计耗时 {stats['seconds']:.1f} 秒"
+    )
+    for host, host_stats in sorted(stats['hosts'].items()):
+        average = host_stats['seconds'] / host_stats['requests'] if host_stats['requests'] else 0
+        logger.info(
+            f"  {host}: {host_stats['requests']} 次，{host_stats['bytes'] / 1024:.1f} KB，"
+            f"平均 {average:.2f} 秒"
+        )
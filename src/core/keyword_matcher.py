@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+# 关键词匹配模块
+# 一组关键词只预处理一次，之后对所有论文复用，并能报告命中了哪些关键词；
+# 匹配语义与原来的小写子串匹配一致
+
+import re
+from functools import lru_cache
+
+# 关键词数不超过该值时逐个做子串查找（C实现，关键词少时最快）；
+# 超过时改用按前缀树组织的单个正则表达式，每篇论文只扫描一次文本
+LINEAR_SCAN_LIMIT = 200
+
+
+def entry_text(title, summary):
+    """构造用于匹配的小写文本（标题 + 摘要）"""
+    return title.lower() + ' ' + (summary or "").lower()
+
+
+def _trie_pattern(words):
+    """将一组字符串构造为前缀树形式的正则表达式，同一位置优先匹配最长的字符串"""
+    trie = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[''] = True
+
+    def build(node):
+        branches = []
+        leaves = []
+        for char in sorted(key for key in node if key):
+            child = build(node[char])
+            if child is None:
+                leaves.append(re.escape(char))
+            else:
+                branches.append(re.escape(char) + child)
+        if leaves:
+            branches.append(leaves[0] if len(leaves) == 1 else '[' + ''.join(leaves) + ']')
+        if not branches:
+            return None
+        pattern = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        # 当前节点本身是一个完整的字符串时，后续部分可选（贪婪，优先更长的匹配）
+        if '' in node:
+            pattern = '(?:' + pattern + ')?'
+        return pattern
+
+    return build(trie)
+
+
+class KeywordMatcher:
+    """
+    预编译的多关键词匹配器
+
+    关键词较多时，全部关键词组成一个前缀树正则：search 判断是否有任意关键词出现；
+    前瞻形式的 finditer 在每个位置找出最长的命中，再展开它包含的更短关键词，
+    从而得到全部命中的关键词（包括相互重叠的关键词）。
+    """
+
+    def __init__(self, keywords):
+        # 去重并保持原有顺序
+        self.keywords = list(dict.fromkeys(keywords))
+        self._lowered = [(keyword, keyword.lower()) for keyword in self.keywords]
+
+        # 空关键词与任何文本都匹配
+        self._match_all = any(not lowered for _, lowered in self._lowered)
+        self._patterns = {lowered for _, lowered in self._lowered if lowered}
+        self._linear = sorted(self._patterns, key=len)
+        self._contained = {}
+
+        self._search = None
+        self._finditer = None
+        if len(self._patterns) > LINEAR_SCAN_LIMIT:
+            trie = _trie_pattern(self._patterns)
+            self._search = re.compile(trie).search
+            self._finditer = re.compile(f'(?=({trie}))').finditer
+
+    def __len__(self):
+        return len(self.keywords)
+
+    def search(self, text):
+        """判断小写文本中是否出现任意关键词"""
+        if self._match_all:
+            return True
+        if self._search is None:
+            return any(pattern in text for pattern in self._linear)
+        return self._search(text) is not None
+
+    def is_relevant(self, title, summary):
+        """判断论文是否与任意关键词相关"""
+        return self.search(entry_text(title, summary))
+
+    def match_text(self, text):
+        """
+        返回小写文本中出现的全部关键词
+
+        返回:
+            list: 命中的关键词（原始写法），按构造时的顺序排列
+        """
+        if self._finditer is None:
+            return [keyword for keyword, lowered in self._lowered if lowered in text]
+
+        found = set()
+        for match in self._finditer(text):
+            found |= self._expand(match.group(1))
+        if self._match_all:
+            found.add('')
+        if not found:
+            return []
+        return [keyword for keyword, lowered in self._lowered if lowered in found]
+
+    def matched_keywords(self, title, summary):
+        """返回论文标题和摘要中出现的全部关键词"""
+        return self.match_text(entry_text(title, summary))
+
+    def _expand(self, pattern):
+        """返回命中的关键词本身及其包含的全部更短关键词"""
+        contained = self._contained.get(pattern)
+        if contained is None:
+            # 以该关键词开头的更短关键词
+            contained = {pattern[:end] for end in range(1, len(pattern) + 1)} & self._patterns
+            # 从其余位置开始的关键词
+            for match in self._finditer(pattern, 1):
+                contained |= self._expand(match.group(1))
+            self._contained[pattern] = contained
+        return contained
+
+
+@lru_cache(maxsize=256)
+def _cached_matcher(keywords):
+    return KeywordMatcher(keywords)
+
+
+def get_matcher(keywords):
+    """获取关键词列表对应的匹配器，相同的关键词列表复用同一个匹配器"""
+    return _cached_matcher(tuple(keywords))
+
+
+class KeywordIndex:
+    """
+    关键词倒排索引：关键词 → 订阅该关键词的用户
+
+    所有用户的关键词合并为一个匹配器，每篇论文只扫描一次，
+    即可直接得到对它感兴趣的全部用户。
+    """
+
+    def __init__(self, user_keywords):
+        """
+        参数:
+            user_keywords: {用户ID: [关键词, ...]}
+        """
+        self._users = {}
+        for user_id, keywords in user_keywords.items():
+            for keyword in keywords:
+                self._users.setdefault(keyword.lower(), set()).add(user_id)
+        self.matcher = KeywordMatcher(list(self._users))
+
+    def __len__(self):
+        return len(self._users)
+
+    def match_keywords(self, title, summary):
+        """
+        返回关键词命中该论文的用户及各自命中的关键词
+
+        返回:
+            dict: {用户ID: [关键词（小写）, ...]}
+        """
+        matched = {}
+        for keyword in self.matcher.matched_keywords(title, summary):
+            for user_id in self._users[keyword]:
+                matched.setdefault(user_id, []).append(keyword)
+        return matched
@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+# 邮件发件箱模块
+# 收集阶段把待发送的邮件与已发送论文记录写入同一个事务，投递与收集解耦：
+# 发送进程领取等待发送的邮件并发投递，失败时按指数退避重试，超过次数后标记为失败；
+# 发送成功后清空正文，已发送和已放弃的记录保留 EMAIL_OUTBOX_RETENTION_DAYS 天后删除
+
+import logging
+import concurrent.futures
+from datetime import datetime, timedelta
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from email.header import Header
+from email.utils import formataddr
+
+from sqlalchemy import and_, or_, update
+
+from src.config import settings
+from src.core.smtp_pool import SmtpPool
+
+logger = logging.getLogger(__name__)
+
+# 邮件状态
+PENDING = 'pending'
+SENDING = 'sending'
+SENT = 'sent'
+FAILED = 'failed'
+
+# 每轮从发件箱领取的最大邮件数
+CLAIM_BATCH_SIZE = 100
+
+
+def build_email_message(recipient, subject, html_body):
+    """构造HTML邮件"""
+    msg = MIMEMultipart()
+    msg['From'] = formataddr((str(Header('论文收集器', 'utf-8')), settings.SENDER_EMAIL))
+    msg['To'] = recipient
+    msg['Subject'] = subject
+    msg.attach(MIMEText(html_body, 'html', 'utf-8'))
+    return msg
+
+
+def enqueue_email(user, subject, html_body):
+    """
+    将邮件加入发件箱
+    只添加到当前会话，由调用方与其他写入一起提交
+
+    返回:
+        OutboundEmail: 新的发件箱记录
+    """
+    from ..models import OutboundEmail, db
+
+    email = OutboundEmail(
+        user_id=user.id,
+        recipient=user.email,
+        subject=subject,
+        html_body=html_body,
+        status=PENDING,
+        attempts=0,
+        next_attempt_at=datetime.utcnow(),
+    )
+    db.session.add(email)
+    return email
+
+
+def _claimable(now):
+    """可以领取的邮件：到期的等待发送邮件，以及领取后长时间未完成的邮件"""
+    from ..models import OutboundEmail
+
+    stale = now - timedelta(seconds=settings.EMAIL_CLAIM_TIMEOUT)
+    return or_(
+        and_(OutboundEmail.status == PENDING, OutboundEmail.next_attempt_at <= now),
+        and_(OutboundEmail.status == SENDING, OutboundEmail.claimed_at < stale),
+    )
+
+
+def claim_emails(limit, ids=None):
+    """
+    领取一批待发送的邮件并标记为发送中
+    每封邮件用带条件的UPDATE领取，多个发送进程同时运行时同一封邮件只会被领取一次
+
+    参数:
+        limit: 最多领取的邮件数
+        ids: 只领取这些ID的邮件，可选
+
+    返回:
+        list: 领取到的 OutboundEmail 列表
+    """
+    from ..models import OutboundEmail, db
+
+    now = datetime.utcnow()
+    query = db.session.query(OutboundEmail.id).filter(_claimable(now))
+    if ids is not None:
+        query = query.filter(OutboundEmail.id.in_(ids))
+    candidates = [row[0] for row in query.order_by(OutboundEmail.id).limit(limit).all()]
+
+    claimed = []
+    for email_id in candidates:
+        result = db.session.execute(
+            update(OutboundEmail)
+            .where(OutboundEmail.id == email_id, _claimable(now))
+            .values(status=SENDING, claimed_at=now, attempts=OutboundEmail.attempts + 1)
+        )
+        if result.rowcount:
+            claimed.append(email_id)
+    db.session.commit()
+
+    if not claimed:
+        return []
+    return OutboundEmail.query.filter(OutboundEmail.id.in_(claimed)).order_by(OutboundEmail.id).all()
+
+
+def _deliver(sender, msg):
+    """发送一封邮件，返回错误（成功时为None）"""
+    try:
+        sender.send(msg)
+        return None
+    except Exception as e:
+        return e
+
+
+def _finish(email, error):
+    """根据发送结果更新邮件状态"""
+    now = datetime.utcnow()
+    if error is None:
+        email.status = SENT
+        email.sent_at = now
+        email.last_error = None
+        # 正文只用于发送，发送后不再保留
+        email.html_body = ''
+        return SENT
+
+    email.last_error = str(error)
+    if email.attempts >= settings.EMAIL_MAX_ATTEMPTS:
+        email.status = FAILED
+        logger.error(f"向 {email.recipient} 发送邮件 {email.id} 失败 {email.attempts} 次，已放弃: {error}")
+        return FAILED
+
+    email.status = PENDING
+    email.next_attempt_at = now + timedelta(seconds=settings.EMAIL_RETRY_DELAY * 2 ** (email.attempts - 1))
+    logger.error(f"向 {email.recipient} 发送邮件 {email.id} 失败，将在 {email.next_attempt_at} 后重试: {error}")
+    return PENDING
+
+
+def send_outbox(max_workers=None, limit=None, ids=None, sender=None):
+    """
+    投递发件箱中等待发送的邮件，直到没有可领取的邮件
+
+    参数:
+        max_workers: 并发发送数，默认使用 settings.EMAIL_SEND_WORKERS
+        limit: 本次最多发送的邮件数，可选
+        ids: 只发送这些ID的邮件，可选
+        sender: SmtpPool对象，可选；未提供时创建与并发数相同大小的连接池
+
+    返回:
+        dict: {'sent': 发送成功数, 'retry': 等待重试数, 'failed': 放弃数}
+    """
+    from ..models import db
+
+    max_workers = max_workers or settings.EMAIL_SEND_WORKERS
+    stats = {'sent': 0, 'retry': 0, 'failed': 0}
+    own_sender = sender is None
+    if own_sender:
+        sender = SmtpPool(size=max_workers)
+
+    executor = None
+    try:
+        while limit is None or sum(stats.values()) < limit:
+            batch_size = CLAIM_BATCH_SIZE if limit is None else min(CLAIM_BATCH_SIZE, limit - sum(stats.values()))
+            emails = claim_emails(batch_size, ids)
+            if not emails:
+                break
+
+            messages = [build_email_message(email.recipient, email.subject, email.html_body) for email in emails]
+            if len(messages) == 1 or max_workers == 1:
+                errors = [_deliver(sender, msg) for msg in messages]
+            else:
+                if executor is None:
+                    executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers)
+                errors = list(executor.map(lambda msg: _deliver(sender, msg), messages))
+
+            for email, error in zip(emails, errors):
+                status = _finish(email, error)
+                stats[{SENT: 'sent', PENDING: 'retry', FAILED: 'failed'}[status]] += 1
+            db.session.commit()
+
+            if ids is not None:
+                break
+    finally:
+        if executor is not None:
+            executor.shutdown()
+        if own_sender:
+            sender.close()
+
+    return stats
+
+
+def prune_outbox(retention_days=None):
+    """
+    删除创建时间早于保留期的已发送和已放弃邮件
+
+    参数:
+        retention_days: 保留天数，默认使用 settings.EMAIL_OUTBOX_RETENTION_DAYS
+
+    返回:
+        int: 删除的邮件数
+    """
+    from ..models import OutboundEmail, db
+
+    retention_days = settings.EMAIL_OUTBOX_RETENTION_DAYS if retention_days is None else retention_days
+    cutoff = datetime.utcnow() - timedelta(days=retention_days)
+    try:
+        deleted = (OutboundEmail.query
+                   .filter(OutboundEmail.status.in_((SENT, FAILED)), OutboundEmail.created_at < cutoff)
+                   .delete(synchronize_session=False))
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"清理发件箱时出错: {e}")
+        return 0
+    return deleted
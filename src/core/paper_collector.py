@@ -6,18 +6,12 @@
 
 import os
 import feedparser
-import requests
-from datetime import datetime, timedelta
+from datetime import datetime
 import concurrent.futures
+import itertools
 import logging
-import smtplib
-from email.mime.multipart import MIMEMultipart
-from email.mime.text import MIMEText
 import importlib.util
 import sys
-import ssl
-from email.header import Header
-from email.utils import formataddr
 
 # 添加src目录到Python路径
 src_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -26,6 +20,23 @@ if src_dir not in sys.path:
 
 # 导入配置模块
 from src.config import settings
+from src.core.fetch_cache import FetchCache, normalize_feed_url
+from src.core.arxiv_query import normalize_arxiv_keyword, plan_arxiv_queries, fetch_arxiv_batch, arxiv_date_window
+from src.core.arxiv_cache import get_arxiv_cache
+from src.core.keyword_matcher import get_matcher, KeywordIndex
+from src.core.paper_record import PaperRecord
+from src.core.paper_store import chunks, record_sent_papers
+from src.core.smtp_pool import SmtpPool
+from src.core.outbox import build_email_message, enqueue_email, send_outbox
+from src.core.email_render import render_digest, FragmentCache
+from src.core.feed_watermark import (
+    entry_fingerprint, load_watermarks, record_feed_entries, seen_entries, save_watermarks
+)
+from src.core.send_schedule import current_window, format_window, due_users_query
+from src.core.pipeline import run_tasks, fetch_stage, parse_stage, canonical_stage, dedup_stage, render_stage
+from src.core.feed_state import get_feed_state_store
+from src.core.http_client import http_get, log_metrics, metrics as http_metrics
+from src.core.host_guard import CircuitOpenError, get_host_guard
 
 # 设置日志
 def setup_logging():
@@ -47,100 +58,152 @@ def is_relevant_paper(title, summary, keywords):
     检查论文是否与关键词相关
     如果匹配则返回True，否则返回False
     """
-    text = title.lower() + ' ' + (summary or "").lower()
-    return any(keyword.lower() in text for keyword in keywords)
+    return get_matcher(keywords).is_relevant(title, summary)
 
-def fetch_arxiv_papers(keyword):
+def parse_feed_content(content):
     """
-    根据关键词从arXiv获取论文
-    限制为最近90天内的提交
+    解析已下载的RSS/Atom内容，返回全部条目
+    解析结果会被缓存并在用户之间共享，因此在这里转换为列表
     """
-    all_papers = []
-    # 计算90天前的日期（arXiv格式：YYYY-MM-DD）
-    one_month_ago = (datetime.now() - timedelta(days=90)).strftime('%Y-%m-%d')
+    return list(parse_stage(feedparser.parse(content)))
 
-    params = {
-        'search_query': f'all:{keyword}',  # 在所有字段中搜索关键词
-        'start': 0,  # 搜索结果的起始索引
-        'max_results': 5,  # 每个关键词限制为5个结果（可根据需要调整）
-        'sortBy': 'submittedDate',  # 按提交日期排序
-        'sortOrder': 'descending'  # 显示最新论文
-    }
-    query_url = f"{settings.ARXIV_API_URL}?search_query=all:{keyword}+AND+submittedDate:[{one_month_ago}0000+TO+*]"
+def arxiv_source_key(keyword):
+    """arXiv关键词在抓取缓存中的键"""
+    return ('arxiv', normalize_arxiv_keyword(keyword))
 
-    try:
-        response = requests.get(query_url, params=params)
+def rss_source_key(feed_url):
+    """RSS源在抓取缓存中的键"""
+    return ('rss', normalize_feed_url(feed_url))
+
+def load_source_entries(url):
+    """
+    下载来源并解析，返回全部条目
+    发送条件请求；未变化的来源直接复用上次的解析结果
+    """
+    store = get_feed_state_store()
+    response = http_get(url, headers=store.request_headers(url))
+    if response.status_code != 304:
         response.raise_for_status()  # 检查请求是否成功
 
-        # 解析XML响应
-        feed = response.text
-        entries = feedparser.parse(feed).entries
-        for entry in entries:
-            title = entry.title
-            summary = entry.summary
-            link = entry.link
-            all_papers.append((title, summary, link))
-    except requests.exceptions.RequestException as e:
-        logger.error(f"从arXiv获取关键词'{keyword}'的论文时出错: {e}")
-    
-    return all_papers
+    return store.resolve(url, response.status_code, response.headers, response.content, parse_feed_content)
+
+def load_rss_entries(feed_url):
+    """下载并解析RSS源，返回全部条目"""
+    return load_source_entries(feed_url)
 
-def fetch_techrxiv_papers(keywords):
+def load_feed_entries(feed_url, cache=None):
     """
-    从TechRxiv获取论文
-    使用TechRxiv的RSS feed
+    获取RSS源的全部条目
+    提供cache时同一RSS源在本次运行中只下载、解析一次
     """
-    try:
-        feed = feedparser.parse(settings.TECHRXIV_API_URL)
-        relevant_papers = []
+    if cache is None:
+        return load_rss_entries(feed_url)
+    return cache.get_or_fetch(rss_source_key(feed_url), lambda: load_rss_entries(feed_url))
 
-        for entry in feed.entries:
-            title = entry.get('title', 'No Title')
-            link = entry.get('link', '')
-            summary = entry.get('summary', '')
+def prefetch_arxiv_papers(keywords, cache):
+    """
+    将关键词合并为少量arXiv检索，并把每个关键词的结果写入抓取缓存
+    全局结果缓存中未过期的关键词直接复用，不再请求arXiv
 
-            if is_relevant_paper(title, summary, keywords):
-                relevant_papers.append((title, summary, link))
+    参数:
+        keywords: 关键词列表
+        cache: FetchCache对象
+    """
+    arxiv_cache = get_arxiv_cache()
+    window = arxiv_date_window()
 
-        return relevant_papers
-    except Exception as e:
-        logger.error(f"从TechRxiv获取论文时出错: {e}")
-        return []
+    missing = []
+    for keyword in {normalize_arxiv_keyword(kw) for kw in keywords}:
+        entries = arxiv_cache.get(keyword, window)
+        if entries is None:
+            missing.append(keyword)
+        else:
+            cache.put(arxiv_source_key(keyword), entries)
+
+    for batch in plan_arxiv_queries(missing):
+        try:
+            found = fetch_arxiv_batch(batch, load_source_entries)
+        except Exception as e:
+            logger.error(f"从arXiv合并检索关键词 {batch} 时出错: {e}")
+            for keyword in batch:
+                cache.put_error(arxiv_source_key(keyword), e)
+            continue
+
+        for keyword, entries in found.items():
+            cache.put(arxiv_source_key(keyword), entries)
+            arxiv_cache.put(keyword, window, entries)
+
+def fetch_arxiv_batch_papers(keywords, cache=None):
+    """
+    使用合并检索从arXiv获取一组关键词的论文
+    限制为最近90天内的提交，每个关键词最多 settings.ARXIV_RESULTS_PER_KEYWORD 篇
+
+    参数:
+        keywords: 关键词列表
+        cache: FetchCache对象，可选；已在本次运行中检索过的关键词不再请求
 
-def parse_rss_feed(feed_url, keywords):
+    返回:
+        list: 按关键词顺序合并、按链接去重的 PaperRecord 列表，记录中带有检索到它的关键词
     """
-    解析RSS源，根据关键词筛选论文，并返回相关论文列表
-    添加网络或解析问题的错误处理
+    cache = cache if cache is not None else FetchCache()
+    prefetch_arxiv_papers([kw for kw in keywords if arxiv_source_key(kw) not in cache], cache)
+
+    papers = {}
+    for keyword in keywords:
+        try:
+            entries = cache.get(arxiv_source_key(keyword))
+        except Exception as e:
+            logger.error(f"从arXiv获取关键词'{keyword}'的论文时出错: {e}")
+            continue
+        for entry in entries:
+            paper = papers.get(entry[2])
+            if paper is None:
+                papers[entry[2]] = PaperRecord.from_entry(entry, (keyword,))
+            elif keyword not in paper.keywords:
+                paper.keywords += (keyword,)
+    return list(papers.values())
+
+def fetch_arxiv_papers(keyword, cache=None):
     """
-    try:
-        feed = feedparser.parse(feed_url)
-        relevant_papers = []
+    根据关键词从arXiv获取论文
+    限制为最近90天内的提交
 
-        for entry in feed.entries:
-            title = entry.get('title', 'No Title')  # 安全获取标题
-            link = entry.link
-            summary = entry.get('summary', '')
+    参数:
+        keyword: 关键词
+        cache: FetchCache对象，可选；提供时同一关键词在本次运行中只请求一次
+    """
+    return fetch_arxiv_batch_papers([keyword], cache)
 
-            if is_relevant_paper(title, summary, keywords):
-                relevant_papers.append((title, summary, link))
+def fetch_sources_concurrently(tasks, max_workers=None, timeout=None):
+    """
+    使用有界线程池并发执行抓取任务
 
-        return relevant_papers
-    except Exception as e:
-        logger.error(f"解析RSS源 {feed_url} 时出错: {e}")
-        return []
+    参数:
+        tasks: 抓取任务列表 [(描述, 函数, 参数元组), ...]
+        max_workers: 最大线程数，默认使用 settings.FETCH_MAX_WORKERS
+        timeout: 单个任务从开始执行起的超时时间（秒），默认使用 settings.FETCH_TIMEOUT
+
+    返回:
+        list: 与任务顺序一致的结果列表，出错或超时的任务结果为空列表
+    """
+    results = [[] for _ in tasks]
+    for index, result in run_tasks(tasks, max_workers, timeout):
+        results[index] = result
+    return results
 
-def collect_papers_for_user(user):
+def collect_papers_for_user(user, cache=None):
     """
     为特定用户收集论文并发送邮件
     
     参数:
         user: 用户对象，包含用户的RSS订阅和关键词信息
+        cache: FetchCache对象，可选；批量运行时在用户之间共享已下载的订阅源
     
     返回:
         tuple: (成功标志, 总论文数, 新论文数, 消息)
     """
     import logging
-    from ..models import RssFeed, Keyword, SentPaper, db
+    from ..models import RssFeed, Keyword
     
     logger = logging.getLogger(__name__)
     
@@ -157,227 +220,158 @@ def collect_papers_for_user(user):
         if not keywords:
             return False, 0, 0, "用户未添加任何关键词"
         
-        # 获取用户已经发送过的论文URL列表
-        sent_paper_urls = {paper.paper_url for paper in SentPaper.query.filter_by(user_id=user.id).all()}
+        # 构建来源：RSS源、合并后的arXiv检索、TechRxiv；RSS和TechRxiv按关键词筛选
+        matcher = get_matcher(keywords)
+        sources = [(f"用户 {user.email} 的RSS源 {feed_url}", load_feed_entries, (feed_url, cache), matcher)
+                   for feed_url in rss_feeds]
+        sources += [(f"用户 {user.email} 的arXiv检索 {batch}", fetch_arxiv_batch_papers, (batch, cache), None)
+                    for batch in plan_arxiv_queries(keywords)]
+        sources.append((f"用户 {user.email} 的TechRxiv论文", load_feed_entries,
+                        (settings.TECHRXIV_API_URL, cache), matcher))
         
-        # 收集论文
-        all_papers = []
+        # 只对各订阅源水位之后首次出现的条目做匹配和去重，同时记录本次处理过的订阅源
+        run_at = datetime.utcnow()
+        watermarks = load_watermarks({user.id: keywords})
+        feed_urls = rss_feeds + [settings.TECHRXIV_API_URL]
+        feed_indexes = {index: feed_url for index, feed_url in enumerate(rss_feeds)}
+        feed_indexes[len(sources) - 1] = settings.TECHRXIV_API_URL
+        processed = set()
         
-        # 1. 从RSS源收集
-        for feed_url in rss_feeds:
-            try:
-                papers = parse_rss_feed(feed_url, keywords)
-                all_papers.extend(papers)
-            except Exception as e:
-                logger.error(f"为用户 {user.email} 解析RSS源 {feed_url} 时出错: {e}")
+        def skip_seen_entries(index, entries):
+            if index not in feed_indexes or not entries:
+                return entries
+            source = normalize_feed_url(feed_indexes[index])
+            fingerprints = [entry_fingerprint(entry) for entry in entries]
+            first_seen = record_feed_entries(source, fingerprints, run_at)
+            processed.add(source)
+            seen = seen_entries(first_seen, watermarks.get((user.id, source)))
+            return [entry for entry, fingerprint in zip(entries, fingerprints) if fingerprint not in seen]
         
-        # 2. 对于每个关键词，从arXiv收集
-        for keyword in keywords:
-            try:
-                papers = fetch_arxiv_papers(keyword)
-                all_papers.extend(papers)
-            except Exception as e:
-                logger.error(f"为用户 {user.email} 从arXiv获取关键词 '{keyword}' 的论文时出错: {e}")
+        # 并发抓取，论文按来源顺序流入去重和发送阶段
+        result = deliver_papers_to_user(user, fetch_stage(sources, on_result=skip_seen_entries))
+        if result[0]:
+            save_user_watermarks(user.id, keywords, feed_urls, processed, run_at)
+        return result
         
-        # 3. 从TechRxiv收集
-        try:
-            papers = fetch_techrxiv_papers(keywords)
-            all_papers.extend(papers)
-        except Exception as e:
-                logger.error(f"为用户 {user.email} 从TechRxiv获取论文时出错: {e}")
-        
-        # 过滤掉已经发送过的论文
-        new_papers = []
-        for paper in all_papers:
-            title, summary, url = paper
-            if url not in sent_paper_urls:
-                new_papers.append(paper)
-                # 记录新论文到已发送列表
-                sent_paper = SentPaper(
-                    user_id=user.id,
-                    paper_url=url,
-                    title=title,
-                    sent_at=datetime.utcnow()
-                )
-                db.session.add(sent_paper)
-        
-        # 提交数据库更改
-        db.session.commit()
+    except Exception as e:
+        logger.error(f"为用户 {user.email} 收集论文时出错: {e}")
+        return False, 0, 0, str(e)
+
+def deliver_papers_to_user(user, all_papers, paper_ids=None, sender=None, fragments=None):
+    """
+    过滤掉已发送过的论文，记录新论文并把邮件写入发件箱
+    已发送论文记录与发件箱中的邮件在同一个事务中提交，邮件发送失败时会留在发件箱中重试；
+    settings.EMAIL_DELIVERY 为 inline 时随后立即发送，为 queue 时由 run.py send-queue 发送
+    
+    参数:
+        user: 用户对象
+        all_papers: 本次为该用户收集到的论文，可以是列表或逐篇产出论文的生成器
+        paper_ids: 本次运行中已经写入papers表的 {canonical_key: paper_id}，
+                   多个用户共享时每篇论文只写入一次，可选
+        sender: SmtpPool对象，可选；批量发送时在用户之间复用SMTP连接
+        fragments: FragmentCache对象，可选；批量发送时在用户之间复用已渲染的论文片段
+    
+    返回:
+        tuple: (成功标志, 总论文数, 新论文数, 消息)
+    """
+    from ..models import db
+    
+    try:
+        # 论文流经规范化和去重阶段，逐批过滤掉已经发送过的论文；
+        # 同一篇论文以不同链接或来源重复出现时只保留一次
+        stats = {'total': 0}
+        new_papers = list(dedup_stage(user.id, canonical_stage(all_papers, stats)))
+        total = stats['total']
         
-        # 如果有新论文，发送邮件
-        if new_papers:
-            # 检查是否有足够的信息发送邮件
-            if not user.email:
-                return True, len(all_papers), len(new_papers), "用户邮箱为空，无法发送邮件"
-            
-            # 准备邮件内容
+        # 记录新论文到已发送列表，并把邮件写入发件箱，一起提交
+        record_sent_papers(user.id, new_papers, paper_ids=paper_ids, commit=False)
+        email = None
+        if new_papers and user.email:
             today_str = datetime.now().strftime("%Y-%m-%d")
             subject = f"[论文订阅] {today_str} - 发现 {len(new_papers)} 篇新论文"
-            
-            # 发送邮件
-            email_success, email_message = send_email_to_user(user, subject, new_papers, all_papers)
-            
-            if email_success:
-                return True, len(all_papers), len(new_papers), "邮件发送成功"
-            else:
-                return False, len(all_papers), len(new_papers), f"邮件发送失败: {email_message}"
+            email = enqueue_email(user, subject, render_email_html(user, new_papers, fragments))
+        db.session.commit()
+        
+        if not new_papers:
+            return True, total, 0, "没有新论文"
+        
+        # 检查是否有足够的信息发送邮件
+        if email is None:
+            return True, total, len(new_papers), "用户邮箱为空，无法发送邮件"
+        
+        if settings.EMAIL_DELIVERY == 'queue':
+            return True, total, len(new_papers), "邮件已加入发送队列"
+        
+        # 立即发送这封邮件
+        result = send_outbox(ids=[email.id], sender=sender)
+        if result['sent']:
+            logger.info(f"成功向用户 {user.email} 发送邮件")
+            return True, total, len(new_papers), "邮件发送成功"
         else:
-            return True, len(all_papers), 0, "没有新论文"
+            return False, total, len(new_papers), f"邮件发送失败: {email.last_error}"
         
     except Exception as e:
+        db.session.rollback()
         logger.error(f"为用户 {user.email} 收集论文时出错: {e}")
         return False, 0, 0, str(e)
 
-def send_email_to_user(user, subject, new_papers, all_papers=None):
+def save_user_watermarks(user_id, keywords, feed_urls, processed, run_at):
+    """
+    成功投递后记录用户各订阅源的水位
+    失败时只记录日志，下次运行会重新处理这些条目，由已发送论文记录去重
+    
+    参数:
+        user_id: 用户ID
+        keywords: 用户本次使用的关键词
+        feed_urls: 用户的全部订阅源URL（含TechRxiv）
+        processed: 本次已处理的规范化URL集合
+        run_at: 本次运行开始的时间（UTC）
+    """
+    from ..models import db
+    
+    try:
+        save_watermarks(user_id, keywords, processed, {normalize_feed_url(url) for url in feed_urls}, run_at)
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"更新用户 {user_id} 的订阅源水位时出错: {e}")
+
+def render_email_html(user, new_papers, fragments=None):
+    """
+    生成论文邮件的HTML正文
+    
+    参数:
+        user: 用户对象
+        new_papers: 新论文列表
+        fragments: FragmentCache对象，可选；提供时复用已渲染的论文片段
+    
+    返回:
+        str: HTML正文
+    """
+    return render_digest(user.username, len(new_papers), render_stage(new_papers, fragments))
+
+def send_email_to_user(user, subject, new_papers, all_papers=None, sender=None):
     """
-    向特定用户发送论文邮件
+    向特定用户发送论文邮件（不经过发件箱）
     
     参数:
         user: 用户对象
         subject: 邮件主题
         new_papers: 新论文列表
         all_papers: 所有论文列表，可选
+        sender: SmtpPool对象，可选；批量发送时复用已登录的连接，未提供时单独建立一次连接
     
     返回:
         tuple: (成功标志, 消息)
     """
-    from email.mime.multipart import MIMEMultipart
-    from email.mime.text import MIMEText
-    import smtplib
-    import ssl
-    from email.header import Header
-    from email.utils import formataddr
-    import logging
-    
-    from src.config import settings
-    
-    logger = logging.getLogger(__name__)
-    
     try:
-        # 创建邮件消息
-        msg = MIMEMultipart()
-        
-        # 添加发件人和收件人
-        msg['From'] = formataddr((str(Header('论文收集器', 'utf-8')), settings.SENDER_EMAIL))
-        msg['To'] = user.email
-        msg['Subject'] = subject
-        
-        # 生成邮件正文 - 优化样式，更加简洁现代
-        html_body = f"""
-        <html>
-        <head>
-            <style>
-                body {{ 
-                    font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, Helvetica, Arial, sans-serif; 
-                    line-height: 1.6; 
-                    color: #333; 
-                    max-width: 800px; 
-                    margin: 0 auto; 
-                    padding: 20px;
-                }}
-                h1 {{ 
-                    color: #333; 
-                    font-size: 24px; 
-                    margin-bottom: 20px; 
-                    border-bottom: 1px solid #eee; 
-                    padding-bottom: 10px; 
-                }}
-                h2 {{ 
-                    color: #444; 
-                    font-size: 20px; 
-                    margin-top: 25px; 
-                    margin-bottom: 15px; 
-                }}
-                .paper {{ 
-                    margin-bottom: 25px; 
-                    padding-bottom: 15px; 
-                    border-bottom: 1px solid #f1f1f1; 
-                }}
-                .paper h3 {{ 
-                    margin-bottom: 10px; 
-                    color: #1a73e8; 
-                    font-size: 18px; 
-                }}
-                .summary {{ 
-                    color: #555; 
-                    margin-bottom: 10px; 
-                    font-size: 15px;
-                    line-height: 1.5;
-                }}
-                .link {{ 
-                    display: inline-block;
-                    color: #1a73e8; 
-                    text-decoration: none; 
-                    font-weight: 500;
-                    padding: 4px 0;
-                }}
-                .footer {{ 
-                    margin-top: 30px; 
-                    padding-top: 15px;
-                    border-top: 1px solid #eee; 
-                    color: #777; 
-                    font-size: 14px; 
-                }}
-                .count-badge {{
-                    display: inline-block;
-                    background: #f1f8ff;
-                    border: 1px solid #dbedff;
-                    color: #1a73e8;
-                    border-radius: 12px;
-                    padding: 2px 8px;
-                    font-size: 14px;
-                    margin-left: 8px;
-                    font-weight: normal;
-                }}
-            </style>
-        </head>
-        <body>
-            <h1>论文订阅</h1>
-            <p>尊敬的 {user.username}，</p>
-            <p>以下是根据您的关键词筛选出的论文：</p>
-        """
-        
-        if new_papers:
-            html_body += f"""
-            <h2>发现的论文 <span class="count-badge">{len(new_papers)}</span></h2>
-            """
-            
-            for i, paper in enumerate(new_papers, 1):
-                title, summary, link = paper
-                html_body += f"""
-                <div class="paper">
-                    <h3>{title}</h3>
-                    <div class="summary">{summary[:250]}{'...' if len(summary) > 250 else ''}</div>
-                    <a class="link" href="{link}">阅读详情 →</a>
-                </div>
-                """
-        else:
-            html_body += """
-            <p>没有发现新论文。</p>
-            """
-        
-        html_body += f"""
-            <div class="footer">
-                <p>此邮件由论文收集器自动发送，请勿回复。</p>
-            </div>
-        </body>
-        </html>
-        """
-        
-        # 添加HTML内容
-        msg.attach(MIMEText(html_body, 'html', 'utf-8'))
+        msg = build_email_message(user.email, subject, render_email_html(user, new_papers))
         
-        # 连接到SMTP服务器并发送邮件
-        if settings.SMTP_USE_SSL:
-            context = ssl.create_default_context()
-            with smtplib.SMTP_SSL(settings.SMTP_SERVER, settings.SMTP_PORT, context=context) as server:
-                server.login(settings.SENDER_EMAIL, settings.SENDER_PASSWORD)
-                server.send_message(msg)
+        # 通过SMTP连接池发送邮件
+        if sender is not None:
+            sender.send(msg)
         else:
-            with smtplib.SMTP(settings.SMTP_SERVER, settings.SMTP_PORT) as server:
-                server.starttls()
-                server.login(settings.SENDER_EMAIL, settings.SENDER_PASSWORD)
-                server.send_message(msg)
+            with SmtpPool(size=1) as pool:
+                pool.send(msg)
         
         logger.info(f"成功向用户 {user.email} 发送邮件")
         return True, "邮件发送成功"
@@ -386,51 +380,356 @@ def send_email_to_user(user, subject, new_papers, all_papers=None):
         logger.error(f"向用户 {user.email} 发送邮件时出错: {e}")
         return False, str(e)
 
-def collect_papers_for_all_users():
+def load_user_subscriptions(user_ids):
+    """
+    批量读取一组用户的RSS源和关键词
+    
+    返回:
+        tuple: ({用户ID: [RSS源URL, ...]}, {用户ID: [关键词, ...]})
+    """
+    from ..models import RssFeed, Keyword
+    
+    user_feeds = {user_id: [] for user_id in user_ids}
+    user_keywords = {user_id: [] for user_id in user_ids}
+    for chunk in chunks(user_ids):
+        for feed in RssFeed.query.filter(RssFeed.user_id.in_(chunk)).order_by(RssFeed.id).all():
+            user_feeds[feed.user_id].append(feed.url)
+        for kw in Keyword.query.filter(Keyword.user_id.in_(chunk)).order_by(Keyword.id).all():
+            user_keywords[kw.user_id].append(kw.text)
+    return user_feeds, user_keywords
+
+def plan_sources(user_ids, user_feeds):
+    """
+    汇总一组用户的所有不同订阅源（含TechRxiv）及其订阅者
+    
+    返回:
+        tuple: ({缓存键: URL}, {缓存键: {用户ID, ...}})
+    """
+    sources = {}
+    subscribers = {}
+    for user_id in user_ids:
+        for url in user_feeds[user_id] + [settings.TECHRXIV_API_URL]:
+            key = rss_source_key(url)
+            sources.setdefault(key, url)
+            subscribers.setdefault(key, set()).add(user_id)
+    return sources, subscribers
+
+def fetch_all_sources(sources, cache, engine):
+    """下载并解析抓取缓存中还没有的订阅源，每个不同的订阅源只下载一次"""
+    pending = {key: url for key, url in sources.items() if key not in cache}
+    if not pending:
+        return
+    logger.info(f"开始下载 {len(pending)} 个订阅源（{engine}引擎）")
+    if engine == 'async':
+        from .async_engine import prefetch_sources
+        prefetch_sources(pending, cache, parse_feed_content, get_feed_state_store())
+    else:
+        fetch_sources_concurrently([
+            (f"订阅源 {url}", fetch_source, (key, url, cache)) for key, url in pending.items()
+        ])
+        # 超时被放弃的来源没有写入缓存，记录为下载错误
+        for key, url in pending.items():
+            if key not in cache:
+                cache.put_error(key, TimeoutError(f"抓取订阅源 {url} 超时"))
+
+def fetch_source(key, url, cache):
+    """下载并解析一个订阅源，结果写入抓取缓存"""
+    return cache.get_or_fetch(key, lambda: load_source_entries(url))
+
+def match_sources_for_users(sources, subscribers, index, cache, watermarks=None, run_at=None, processed=None):
+    """
+    使用关键词倒排索引，一次性为所有订阅者筛选订阅源中的论文
+    每篇论文只扫描一次，得到关键词命中的用户后再与该源的订阅者取交集；
+    所有订阅者的水位之前已出现过的条目不再匹配
+    
+    参数:
+        sources: {缓存键: 下载URL}
+        subscribers: {缓存键: 订阅该源的用户ID集合}
+        index: KeywordIndex对象
+        cache: 已填充的FetchCache对象
+        watermarks: {(用户ID, 规范化URL): 上次成功处理的时间}，可选
+        run_at: 本次运行开始的时间（UTC），可选；提供时记录各订阅源的条目并按水位跳过已处理的条目
+        processed: 集合，可选；提供时加入每个已处理订阅源的缓存键
+    
+    返回:
+        dict: {(用户ID, 缓存键): [PaperRecord, ...]}，记录中带有该用户命中的关键词
+    """
+    watermarks = watermarks or {}
+    matched = {}
+    for key, url in sources.items():
+        try:
+            entries = cache.get(key)
+        except CircuitOpenError:
+            continue
+        except Exception as e:
+            logger.error(f"获取RSS源 {url} 失败: {e}")
+            continue
+        
+        users = subscribers[key]
+        prints = [entry_fingerprint(entry) for entry in entries]
+        first_seen = {}
+        if run_at is not None and prints:
+            first_seen = record_feed_entries(key[1], prints, run_at)
+            if processed is not None:
+                processed.add(key)
+        seen_by_user = {user_id: seen_entries(first_seen, watermarks.get((user_id, key[1]))) for user_id in users}
+        seen_by_all = frozenset.intersection(*seen_by_user.values())
+        
+        for entry, fingerprint in zip(entries, prints):
+            if fingerprint in seen_by_all:
+                continue
+            hits = index.match_keywords(entry[0], entry[1])
+            paper = None
+            for user_id in hits.keys() & users:
+                if fingerprint in seen_by_user[user_id]:
+                    continue
+                # 同一篇论文的各个用户副本共享标题、摘要和身份键，只有命中的关键词不同
+                if paper is None:
+                    paper = PaperRecord.from_entry(entry)
+                matched.setdefault((user_id, key), []).append(paper.with_keywords(hits[user_id]))
+    return matched
+
+def parse_shard(value):
+    """
+    解析 "i/N" 形式的分片参数（i从1开始）
+    
+    返回:
+        tuple: (分片序号, 分片数)，序号从0开始；value为空时返回None
+    """
+    if not value:
+        return None
+    try:
+        index, count = (int(part) for part in value.split('/'))
+    except ValueError:
+        raise ValueError(f"分片参数格式应为 i/N: {value}")
+    if count < 1:
+        raise ValueError(f"分片数应大于0: {value}")
+    if not 1 <= index <= count:
+        raise ValueError(f"分片序号应在 1 到 {count} 之间: {value}")
+    return index - 1, count
+
+def prefetch_arxiv_for_slot(window, shard=None):
+    """
+    预先检索发送时间在 window 内的用户的arXiv关键词，结果写入arXiv结果缓存
+    
+    参数:
+        window: 时间窗口 (start, end]
+        shard: (分片序号, 分片数)，可选
+    
+    返回:
+        int: 需要接收邮件的用户数
+    """
+    user_ids = [user.id for user in due_users_query(*window, shard=shard).all()]
+    if user_ids:
+        _, user_keywords = load_user_subscriptions(user_ids)
+        prefetch_arxiv_papers({kw for keywords in user_keywords.values() for kw in keywords}, FetchCache())
+    return len(user_ids)
+
+def warm_up_sources(window, engine=None, shard=None):
+    """
+    预热：在发送时间到达之前，下载并解析时间窗口内到期用户的全部订阅源和arXiv检索
+    
+    结果写入抓取缓存，投递时把该缓存传给 collect_papers_for_all_users，
+    投递阶段只需完成匹配、去重和发送；预热时下载失败的来源在投递时重新下载。
+    
+    参数:
+        window: 时间窗口 (start, end]
+        engine: 抓取引擎，默认使用 settings.COLLECT_ENGINE
+        shard: (分片序号, 分片数)，可选
+    
+    返回:
+        FetchCache: 已预热的抓取缓存
+    """
+    engine = engine or settings.COLLECT_ENGINE
+    cache = FetchCache()
+    users = due_users_query(*window, shard=shard).all()
+    if not users:
+        return cache
+    
+    user_feeds, user_keywords = load_user_subscriptions([user.id for user in users])
+    active_ids = {user.id for user in users if user_feeds[user.id] and user_keywords[user.id]}
+    sources, _ = plan_sources(active_ids, user_feeds)
+    prefetch_arxiv_papers({kw for user_id in active_ids for kw in user_keywords[user_id]}, cache)
+    fetch_all_sources(sources, cache, engine)
+    cache.clear_errors()
+    
+    logger.info(f"已为 {format_window(window)} 的 {len(active_ids)} 个用户预热 {len(sources)} 个订阅源")
+    return cache
+
+def collect_papers_for_all_users(engine=None, shard=None, window=None, cache=None):
     """
     为所有活跃用户收集论文
     
+    所有用户的来源先统一下载一次，再用关键词倒排索引把每篇论文一次性分发给
+    感兴趣的用户，最后逐个用户去重并发送邮件。
+    
+    参数:
+        engine: 抓取引擎，"thread" 使用线程池并发下载，
+                "async" 在一个事件循环中下载；默认使用 settings.COLLECT_ENGINE
+        shard: (分片序号, 分片数)，可选；只处理该分片中的用户
+        window: 时间窗口 (start, end]，处理发送时间在窗口内的用户；默认为当前这一分钟
+        cache: 抓取缓存，可选；传入 warm_up_sources 预热的缓存时不再重复下载
+    
     返回:
         tuple: (成功用户数, 总用户数, 错误信息列表)
     """
     import logging
-    from datetime import datetime
-    from ..models import User
     
     logger = logging.getLogger(__name__)
     
+    engine = engine or settings.COLLECT_ENGINE
+    if engine not in ('thread', 'async'):
+        raise ValueError(f"未知的收集引擎: {engine}")
+    
     # 获取当前时间
-    now = datetime.now()
-    current_time = now.strftime("%H:%M")
+    window = window or current_window()
     
-    # 查找当前时间应该接收邮件的活跃用户
-    users = User.query.filter_by(is_active=True).filter_by(send_time=current_time).all()
+    # 查找发送时间在窗口内的活跃用户
+    users = due_users_query(*window, shard=shard).all()
     
     if not users:
-        logger.info(f"当前时间 {current_time} 没有需要发送邮件的用户")
+        logger.info(f"当前时间 {format_window(window)} 没有需要发送邮件的用户")
         return 0, 0, []
     
     success_count = 0
     errors = []
     
-    # 为每个用户收集论文
-    for user in users:
-        try:
-            success, total, new, message = collect_papers_for_user(user)
+    # 本次运行共享的抓取缓存，每个不同的订阅源只下载一次
+    if cache is None:
+        cache = FetchCache()
+    http_metrics.reset()
+    # 本次运行已写入papers表的论文和已渲染的论文片段，每篇论文只存储、渲染一次
+    paper_ids = {}
+    fragments = FragmentCache()
+    
+    # 批量读取所有用户的订阅源和关键词，只处理两者都已配置的用户
+    user_feeds, user_keywords = load_user_subscriptions([user.id for user in users])
+    active_ids = {user.id for user in users if user_feeds[user.id] and user_keywords[user.id]}
+    # 各用户订阅源的水位，只对水位之后首次出现的条目做匹配和去重
+    run_at = datetime.utcnow()
+    watermarks = load_watermarks({user_id: user_keywords[user_id] for user_id in active_ids})
+    
+    # 汇总所有不同的订阅源（含TechRxiv）及其订阅者
+    sources, subscribers = plan_sources(active_ids, user_feeds)
+    
+    # 所有用户的arXiv关键词合并为少量检索
+    prefetch_arxiv_papers({kw for user_id in active_ids for kw in user_keywords[user_id]}, cache)
+    
+    # 每个不同的订阅源只下载一次（已预热的来源直接使用缓存）
+    fetch_all_sources(sources, cache, engine)
+    
+    # 用关键词倒排索引把每篇论文一次性分发给感兴趣的用户
+    index = KeywordIndex({user_id: user_keywords[user_id] for user_id in active_ids})
+    processed = set()
+    matched = match_sources_for_users(sources, subscribers, index, cache, watermarks, run_at, processed)
+    techrxiv_key = rss_source_key(settings.TECHRXIV_API_URL)
+    
+    # 为每个用户去重并发送论文，所有邮件复用同一个SMTP连接池
+    with SmtpPool() as sender:
+        for user in users:
+            try:
+                if not user_feeds[user.id]:
+                    success, total, new, message = False, 0, 0, "用户未添加任何RSS源"
+                elif not user_keywords[user.id]:
+                    success, total, new, message = False, 0, 0, "用户未添加任何关键词"
+                else:
+                    # 按 RSS源、arXiv、TechRxiv 的顺序把该用户的论文串联成一个流
+                    streams = [matched.get((user.id, key), [])
+                               for key in dict.fromkeys(rss_source_key(url) for url in user_feeds[user.id])]
+                    streams.append(fetch_arxiv_batch_papers(user_keywords[user.id], cache))
+                    streams.append(matched.get((user.id, techrxiv_key), []))
+                
+                    success, total, new, message = deliver_papers_to_user(
+                        user, itertools.chain.from_iterable(streams), paper_ids, sender, fragments)
+                    if success:
+                        feed_urls = user_feeds[user.id] + [settings.TECHRXIV_API_URL]
+                        keys = {rss_source_key(url) for url in feed_urls}
+                        save_user_watermarks(user.id, user_keywords[user.id], feed_urls,
+                                             {key[1] for key in keys & processed}, run_at)
             
-            if success:
-                success_count += 1
-                logger.info(f"为用户 {user.email} 成功收集论文: 共 {total} 篇，其中 {new} 篇为新论文")
-            else:
-                errors.append(f"用户 {user.email}: {message}")
-                logger.error(f"为用户 {user.email} 收集论文失败: {message}")
+                if success:
+                    success_count += 1
+                    logger.info(f"为用户 {user.email} 成功收集论文: 共 {total} 篇，其中 {new} 篇为新论文")
+                else:
+                    errors.append(f"用户 {user.email}: {message}")
+                    logger.error(f"为用户 {user.email} 收集论文失败: {message}")
         
-        except Exception as e:
-            errors.append(f"用户 {user.email}: {str(e)}")
-            logger.error(f"为用户 {user.email} 收集论文时出错: {e}")
+            except Exception as e:
+                errors.append(f"用户 {user.email}: {str(e)}")
+                logger.error(f"为用户 {user.email} 收集论文时出错: {e}")
+    
+    stats = cache.stats()
+    logger.info(f"本次运行共抓取 {stats['sources']} 个不同的订阅源，关键词索引包含 {len(index)} 个关键词")
+    log_metrics()
+    get_host_guard().log_stats()
+    get_arxiv_cache().log_stats()
+    sender.log_stats()
+    if fragments.hits:
+        logger.info(f"邮件论文片段：渲染 {fragments.misses} 篇，复用 {fragments.hits} 次")
     
     return success_count, len(users), errors
 
+def _collect_shard(engine, shard, window):
+    """在子进程中为一个分片收集论文，使用独立的应用上下文和数据库会话"""
+    from src.app import create_app
+    
+    app = create_app()
+    with app.app_context():
+        return collect_papers_for_all_users(engine=engine, shard=shard, window=window)
+
+def collect_papers_in_parallel(workers, engine=None, shard=None, window=None, cache=None):
+    """
+    将当前时间应接收邮件的用户按ID分片，由多个进程并行收集论文
+    
+    各进程独立下载和解析订阅源；arXiv检索先在当前进程中合并完成并写入磁盘缓存，
+    避免多个进程同时请求arXiv。需要在应用上下文中调用。
+    
+    参数:
+        workers: 进程数，不大于1时在当前进程中收集
+        engine: 抓取引擎，默认使用 settings.COLLECT_ENGINE
+        shard: (分片序号, 分片数)，可选；本实例负责的分片，会被进一步划分给各个进程
+        window: 时间窗口 (start, end]，默认为当前这一分钟
+        cache: 预热的抓取缓存，可选；只在当前进程中收集时使用，子进程依靠磁盘上的
+               arXiv结果缓存和订阅源状态复用预热结果
+    
+    返回:
+        tuple: (成功用户数, 总用户数, 错误信息列表)，汇总所有分片的结果
+    """
+    import multiprocessing
+    
+    window = window or current_window()
+    if not workers or workers <= 1:
+        return collect_papers_for_all_users(engine=engine, shard=shard, window=window, cache=cache)
+    
+    index, count = shard or (0, 1)
+    # 用户ID % (count * workers) == index + count * k 的用户一定属于分片 index
+    shards = [(index + count * k, count * workers) for k in range(workers)]
+    
+    if settings.ARXIV_CACHE_DISK and not prefetch_arxiv_for_slot(window, shard):
+        logger.info(f"当前时间 {format_window(window)} 没有需要发送邮件的用户")
+        return 0, 0, []
+    
+    logger.info(f"使用 {workers} 个进程并行收集论文，分片 {[f'{i}/{n}' for i, n in shards]}")
+    success_count, total_count, errors = 0, 0, []
+    # 使用spawn启动子进程，避免继承父进程的数据库连接
+    context = multiprocessing.get_context('spawn')
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+        futures = {executor.submit(_collect_shard, engine, sub_shard, window): sub_shard
+                   for sub_shard in shards}
+        for future in concurrent.futures.as_completed(futures):
+            sub_shard = futures[future]
+            try:
+                success, total, shard_errors = future.result()
+            except Exception as e:
+                logger.error(f"处理分片 {sub_shard[0]}/{sub_shard[1]} 时出错: {e}")
+                errors.append(f"分片 {sub_shard[0]}/{sub_shard[1]}: {e}")
+                continue
+            success_count += success
+            total_count += total
+            errors.extend(shard_errors)
+    
+    return success_count, total_count, errors
+
 if __name__ == "__main__":
     # 直接运行此模块时的测试代码
     print("论文收集模块测试")
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+# 论文记录模块
+# 订阅源解析出的原始条目 (title, summary, link, published) 在用户之间共享；
+# 匹配之后为每个用户传递的是紧凑的 PaperRecord：使用 __slots__，不带 __dict__，
+# 保存纯文本的完整摘要和发布时间，并携带来源、身份键和命中的关键词；
+# 摘要在渲染邮件时才截断，papers表中存储的是完整摘要
+
+import re
+import html
+from datetime import datetime
+
+from src.core.canonical import paper_identity, paper_source
+
+# 订阅源的摘要中常带有HTML标签，保存前先转换为纯文本
+_TAGS = re.compile(r'<[^>]+>')
+
+
+def plain_text(text):
+    """去掉HTML标签、还原字符实体并压缩空白"""
+    return ' '.join(html.unescape(_TAGS.sub(' ', text)).split())
+
+
+class PaperRecord:
+    """在去重、存储和渲染阶段之间传递的论文记录"""
+
+    __slots__ = ('title', 'summary', 'link', 'published', 'source', 'canonical_key', 'title_key', 'keywords')
+
+    def __init__(self, title, summary, link, keywords=(), published=None):
+        """
+        参数:
+            title: 标题
+            summary: 摘要，转换为纯文本后保存
+            link: 论文链接
+            keywords: 命中的关键词
+            published: 发布时间（UTC，datetime或ISO格式字符串），可选
+        """
+        self.title = title
+        self.summary = plain_text(summary or '')
+        self.link = link
+        if isinstance(published, str):
+            published = datetime.fromisoformat(published)
+        self.published = published
+        self.source = paper_source(link)
+        self.canonical_key, self.title_key = paper_identity(title, link)
+        self.keywords = tuple(keywords)
+
+    @classmethod
+    def from_entry(cls, entry, keywords=()):
+        """由原始条目 (title, summary, link, published) 构造论文记录；兼容缓存中没有发布时间的旧条目"""
+        title, summary, link = entry[:3]
+        published = entry[3] if len(entry) > 3 else None
+        return cls(title, summary, link, keywords, published)
+
+    def with_keywords(self, keywords):
+        """返回只替换命中关键词的副本，其余字段与原记录共享"""
+        record = object.__new__(PaperRecord)
+        for name in self.__slots__:
+            setattr(record, name, getattr(self, name))
+        record.keywords = tuple(keywords)
+        return record
+
+    def __repr__(self):
+        return f'<PaperRecord {self.canonical_key}>'
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+# 论文存储模块
+# 每篇论文只在共享的papers表中存储一次，user_papers只记录 (用户, 论文) 的发送关系；
+# 所有查询都按候选论文分块进行，查询量与历史记录条数无关
+
+from datetime import datetime
+
+from src.config import settings
+
+# 单条SQL中IN条件包含的最大参数个数（SQLite旧版本限制为999）
+IN_CLAUSE_CHUNK_SIZE = 500
+
+
+def chunks(items, size=IN_CLAUSE_CHUNK_SIZE):
+    """将列表按固定大小分块，用于拆分SQL的IN条件和批量写入"""
+    items = list(items)
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def insert_ignoring_duplicates(table):
+    """
+    构造忽略唯一约束冲突的INSERT语句
+    SQLite/PostgreSQL 使用 ON CONFLICT DO NOTHING，MySQL 使用 INSERT IGNORE
+    """
+    from ..models import db
+
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+        return insert(table).on_conflict_do_nothing()
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+        return insert(table).on_conflict_do_nothing()
+    if dialect in ('mysql', 'mariadb'):
+        return table.insert().prefix_with('IGNORE')
+    return table.insert()
+
+
+def _load_paper_ids(keys, paper_ids):
+    """按 canonical_key 分块查询论文ID，结果写入 paper_ids"""
+    from ..models import Paper, db
+
+    for chunk in chunks(keys):
+        rows = db.session.query(Paper.canonical_key, Paper.id)\
+            .filter(Paper.canonical_key.in_(chunk)).all()
+        paper_ids.update(rows)
+
+
+def store_papers(papers, paper_ids=None, batch_size=None):
+    """
+    将论文写入共享的papers表，已存在的论文不会重复写入
+
+    参数:
+        papers: PaperRecord 列表
+        paper_ids: 本次运行中已经写入的 {canonical_key: paper_id}，会被就地更新，可选
+        batch_size: 每批插入的行数，默认使用 settings.SENT_PAPER_BATCH_SIZE
+
+    返回:
+        dict: {canonical_key: paper_id}，包含 papers 中的全部论文
+    """
+    from ..models import Paper, db
+
+    paper_ids = {} if paper_ids is None else paper_ids
+    batch_size = batch_size or settings.SENT_PAPER_BATCH_SIZE
+
+    rows = {}
+    for paper in papers:
+        key = paper.canonical_key
+        if key in paper_ids or key in rows:
+            continue
+        rows[key] = {
+            'canonical_key': key,
+            'title_key': paper.title_key,
+            'title': (paper.title or '')[:512],
+            'summary': paper.summary,
+            'link': paper.link[:512],
+            'source': paper.source,
+            'published_at': paper.published,
+            'created_at': datetime.utcnow(),
+        }
+    if not rows:
+        return paper_ids
+
+    # 先查出已经存在的论文，只插入缺失的部分
+    _load_paper_ids(rows, paper_ids)
+    missing = [row for key, row in rows.items() if key not in paper_ids]
+    if missing:
+        statement = insert_ignoring_duplicates(Paper.__table__)
+        for chunk in chunks(missing, batch_size):
+            db.session.execute(statement, chunk)
+        db.session.commit()
+        _load_paper_ids([row['canonical_key'] for row in missing], paper_ids)
+    return paper_ids
+
+
+def find_sent_keys(user_id, identities):
+    """
+    返回候选论文的身份键中已经发送给该用户的部分
+    按候选键分块查询papers表（canonical_key / title_key 上的索引），
+    再通过 user_papers 的主键确认是否发送给过该用户
+
+    参数:
+        user_id: 用户ID
+        identities: 候选论文的身份键列表 [(canonical_key, title_key), ...]
+
+    返回:
+        set: 已发送过的论文的 canonical_key 和 title_key 集合
+    """
+    from ..models import Paper, UserPaper, db
+
+    sent = set()
+    lookups = (
+        (Paper.canonical_key, {key for key, _ in identities}),
+        (Paper.title_key, {t_key for _, t_key in identities if t_key}),
+    )
+    for column, keys in lookups:
+        for chunk in chunks(keys):
+            rows = db.session.query(Paper.canonical_key, Paper.title_key)\
+                .join(UserPaper, UserPaper.paper_id == Paper.id)\
+                .filter(UserPaper.user_id == user_id, column.in_(chunk)).all()
+            sent.update(key for row in rows for key in row if key)
+    return sent
+
+
+def record_sent_papers(user_id, papers, batch_size=None, paper_ids=None, commit=True):
+    """
+    批量记录已发送的论文
+    论文本身写入共享的papers表，再分批插入 (用户, 论文) 关系并提交；
+    与已有记录冲突的行直接跳过，不会因为一条重复记录导致整批回滚
+
+    参数:
+        user_id: 用户ID
+        papers: PaperRecord 列表
+        batch_size: 每批插入的行数，默认使用 settings.SENT_PAPER_BATCH_SIZE
+        paper_ids: 本次运行中已经写入的 {canonical_key: paper_id}，多个用户共享，可选
+        commit: 是否逐批提交；为False时由调用方与其他写入（如发件箱中的邮件）一起提交
+    """
+    from ..models import UserPaper, db
+
+    batch_size = batch_size or settings.SENT_PAPER_BATCH_SIZE
+    paper_ids = store_papers(papers, paper_ids, batch_size)
+
+    sent_at = datetime.utcnow()
+    rows = {}
+    for paper in papers:
+        paper_id = paper_ids[paper.canonical_key]
+        rows.setdefault(paper_id, {'user_id': user_id, 'paper_id': paper_id, 'sent_at': sent_at})
+
+    statement = insert_ignoring_duplicates(UserPaper.__table__)
+    for chunk in chunks(rows.values(), batch_size):
+        db.session.execute(statement, chunk)
+        if commit:
+            db.session.commit()
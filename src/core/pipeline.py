@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+# 论文处理流水线
+# 抓取 → 解析 → 匹配 → 规范化 → 去重 → 渲染，每个阶段都是生成器：
+# 条目逐个向后流动，前面的来源抓取完成后即可进入后续阶段，
+# 去重阶段每凑满一批候选论文查询一次数据库，不需要先把所有论文合并成一个列表
+
+import time
+import logging
+import concurrent.futures
+from datetime import datetime
+
+from src.config import settings
+from src.core.email_render import render_paper
+from src.core.paper_record import PaperRecord
+from src.core.paper_store import find_sent_keys, IN_CLAUSE_CHUNK_SIZE
+
+logger = logging.getLogger(__name__)
+
+
+def run_tasks(tasks, max_workers=None, timeout=None):
+    """
+    使用有界线程池并发执行抓取任务，按任务顺序逐个产出结果
+    某个任务及其之前的任务都结束后即产出该任务的结果，不必等待全部任务完成
+
+    参数:
+        tasks: 抓取任务列表 [(描述, 函数, 参数元组), ...]
+        max_workers: 最大线程数，默认使用 settings.FETCH_MAX_WORKERS
+        timeout: 单个任务从开始执行起的超时时间（秒），默认使用 settings.FETCH_TIMEOUT
+
+    产出:
+        tuple: (任务序号, 结果)，出错或超时的任务结果为空列表
+    """
+    max_workers = max_workers or settings.FETCH_MAX_WORKERS
+    timeout = timeout or settings.FETCH_TIMEOUT
+    if not tasks:
+        return
+
+    # 记录每个任务实际开始执行的时间，排队等待的时间不计入超时
+    started = {}
+
+    def run(index, func, args):
+        started[index] = time.monotonic()
+        return func(*args)
+
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=min(max_workers, len(tasks)))
+    try:
+        futures = {
+            executor.submit(run, index, func, args): index
+            for index, (_, func, args) in enumerate(tasks)
+        }
+        finished = {}
+        next_index = 0
+        pending = set(futures)
+        while pending:
+            done, pending = concurrent.futures.wait(
+                pending, timeout=min(1.0, timeout),
+                return_when=concurrent.futures.FIRST_COMPLETED
+            )
+            for future in done:
+                index = futures[future]
+                try:
+                    finished[index] = future.result()
+                except Exception as e:
+                    logger.error(f"抓取{tasks[index][0]}时出错: {e}")
+                    finished[index] = []
+
+            # 放弃已超时的任务，线程会在后台自行结束
+            now = time.monotonic()
+            expired = {
+                future for future in pending
+                if futures[future] in started and now - started[futures[future]] > timeout
+            }
+            for future in expired:
+                logger.error(f"抓取{tasks[futures[future]][0]}超时（{timeout:g}秒），已跳过")
+                finished[futures[future]] = []
+            pending -= expired
+
+            while next_index in finished:
+                yield next_index, finished.pop(next_index)
+                next_index += 1
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def fetch_stage(sources, max_workers=None, timeout=None, on_result=None):
+    """
+    抓取阶段：并发抓取各个来源，按来源顺序逐条产出论文
+
+    参数:
+        sources: 来源列表 [(描述, 加载函数, 参数元组, 匹配器), ...]
+                 加载函数返回该来源的原始条目并按匹配器筛选；
+                 匹配器为None时加载函数应直接返回 PaperRecord 列表
+        max_workers: 最大线程数，可选
+        timeout: 单个来源的超时时间（秒），可选
+        on_result: 函数 (来源序号, 结果) -> 结果，可选；每个来源的结果进入后续阶段之前调用，
+                   出错或超时的来源结果为空列表
+
+    产出:
+        PaperRecord: 论文记录
+    """
+    tasks = [(desc, load, args) for desc, load, args, _ in sources]
+    for index, entries in run_tasks(tasks, max_workers, timeout):
+        if on_result is not None:
+            entries = on_result(index, entries)
+        matcher = sources[index][3]
+        if matcher is None:
+            yield from entries
+        else:
+            yield from match_stage(entries, matcher)
+
+
+def parse_stage(feed):
+    """解析阶段：将feedparser的解析结果逐条转换为 (title, summary, link, published)"""
+    for entry in feed.entries:
+        title = entry.get('title', 'No Title')  # 安全获取标题
+        summary = entry.get('summary', '')
+        link = entry.get('link', '')
+        # 发布时间（UTC）以ISO格式保存，条目需要序列化到订阅源状态和arXiv结果缓存中
+        parsed = entry.get('published_parsed') or entry.get('updated_parsed')
+        published = datetime(*parsed[:6]).isoformat() if parsed else None
+        yield title, summary, link, published
+
+
+def match_stage(entries, matcher):
+    """匹配阶段：只保留与关键词相关的条目，转换为带有命中关键词的论文记录"""
+    for entry in entries:
+        keywords = matcher.matched_keywords(entry[0], entry[1])
+        if keywords:
+            yield PaperRecord.from_entry(entry, keywords)
+
+
+def canonical_stage(entries, stats=None):
+    """
+    规范化阶段：确保每篇论文都是带有身份键的 PaperRecord
+
+    参数:
+        entries: PaperRecord 或原始条目 (title, summary, link, published) 的可迭代对象
+        stats: 统计字典，可选；提供时在 stats['total'] 中累计论文数
+
+    产出:
+        PaperRecord: 论文记录
+    """
+    for entry in entries:
+        if stats is not None:
+            stats['total'] = stats.get('total', 0) + 1
+        yield entry if isinstance(entry, PaperRecord) else PaperRecord.from_entry(entry)
+
+
+def dedup_stage(user_id, items, chunk_size=IN_CLAUSE_CHUNK_SIZE):
+    """
+    去重阶段：跳过已经发送给该用户的论文，以及本次运行中重复出现的同一篇论文
+    每凑满 chunk_size 篇候选论文查询一次已发送记录
+
+    参数:
+        user_id: 用户ID
+        items: canonical_stage 产出的 PaperRecord 序列
+        chunk_size: 每次查询的候选论文数
+
+    产出:
+        PaperRecord: 新论文，保持原有顺序
+    """
+    seen = set()
+
+    def flush(batch):
+        sent = find_sent_keys(user_id, [(paper.canonical_key, paper.title_key) for paper in batch])
+        for paper in batch:
+            key, t_key = paper.canonical_key, paper.title_key
+            if key in seen or key in sent or (t_key and (t_key in seen or t_key in sent)):
+                continue
+            seen.add(key)
+            if t_key:
+                seen.add(t_key)
+            yield paper
+
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= chunk_size:
+            yield from flush(batch)
+            batch = []
+    if batch:
+        yield from flush(batch)
+
+
+def render_stage(papers, fragments=None):
+    """
+    渲染阶段：逐篇生成邮件正文中论文的HTML片段
+
+    参数:
+        papers: PaperRecord 的可迭代对象
+        fragments: FragmentCache对象，可选；提供时同一篇论文在本次运行中只渲染一次
+    """
+    render = render_paper if fragments is None else fragments.render
+    for paper in papers:
+        yield render(paper)
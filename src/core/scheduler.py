@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+# 投递调度模块
+# 常驻进程保持一个应用上下文，用最小堆按时间顺序维护所有 (时区, 发送时间) 的下一次投递：
+# 发送时间到达前 SCHEDULER_PREFETCH_MINUTES 分钟预热该时间用户的全部来源，到达时只需匹配、去重和发送；
+# 最近一次投递的时刻保存在状态文件中，重启后用一个时间窗口补发停机期间错过的所有用户
+
+import os
+import json
+import heapq
+import logging
+import itertools
+import threading
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from src.config import settings
+from src.core.paper_collector import collect_papers_in_parallel, warm_up_sources, parse_shard
+from src.core.send_schedule import scheduled_slots, next_slot, as_utc, floor_minute, format_window
+
+logger = logging.getLogger(__name__)
+
+# 任务类型
+PREFETCH = 'prefetch'
+DELIVER = 'deliver'
+
+
+def load_last_slot(path):
+    """读取状态文件中最近一次投递的时刻（UTC），文件不存在或损坏时返回None"""
+    try:
+        with open(path, encoding='utf-8') as f:
+            return as_utc(datetime.fromisoformat(json.load(f)['last_slot']))
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        logger.error(f"读取调度状态文件 {path} 时出错: {e}")
+        return None
+
+
+def save_last_slot(path, slot):
+    """把最近一次投递的时刻写入状态文件（先写临时文件再替换）"""
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'last_slot': slot.isoformat()}, f)
+    os.replace(tmp_path, path)
+
+
+def _prefetch_slot(window):
+    """默认的预取任务：预热该时间窗口内到期用户的全部来源，返回抓取缓存"""
+    return warm_up_sources(window, shard=parse_shard(settings.COLLECT_SHARD))
+
+
+def _deliver_slot(window, cache=None):
+    """默认的投递任务：为该时间窗口内到期的用户收集并发送论文"""
+    success_count, total_count, errors = collect_papers_in_parallel(
+        settings.COLLECT_WORKERS, shard=parse_shard(settings.COLLECT_SHARD), window=window, cache=cache)
+    if total_count:
+        logger.info(f"{format_window(window)} 的论文收集完成: 成功 {success_count}/{total_count} 个用户")
+    for error in errors:
+        logger.error(f"  - {error}")
+
+
+class DeliveryScheduler:
+    """
+    按分钟精度调度投递任务的常驻调度器，需要在应用上下文中运行
+
+    堆中的每一项为 (执行时刻, 序号, 任务类型, 时间窗口, (时区, 发送分钟))，时刻均为UTC。
+    每隔 refresh_seconds 秒重新读取活跃用户的 (时区, 发送分钟)，把上一次刷新之后出现的
+    发送时刻加入堆中；每个发送时刻投递时间窗口 (前一分钟, 发送时刻] 内到期的用户。
+    启动时把状态文件记录的最近一次投递到当前时刻之间作为一个窗口补发。
+    预取任务的返回值（预热的抓取缓存）保存到该发送时刻投递时传给投递函数。
+    """
+
+    def __init__(self, deliver=None, prefetch=None, prefetch_minutes=None, catch_up_minutes=None,
+                 refresh_seconds=None, state_path=None):
+        """
+        参数:
+            deliver: 投递函数，参数为时间窗口 (start, end] 和预取结果（没有预取时为None），默认收集并发送论文
+            prefetch: 预取函数，参数为时间窗口，默认预热全部来源
+            prefetch_minutes: 提前预取的分钟数，默认使用 settings.SCHEDULER_PREFETCH_MINUTES
+            catch_up_minutes: 重启后最多补发多少分钟内错过的发送时间，默认使用 settings.SCHEDULER_CATCH_UP_MINUTES
+            refresh_seconds: 重新读取用户发送时间的间隔，默认使用 settings.SCHEDULER_REFRESH_SECONDS
+            state_path: 状态文件路径，默认使用 settings.SCHEDULER_STATE_FILE
+        """
+        self.deliver = deliver or _deliver_slot
+        self.prefetch = prefetch or _prefetch_slot
+        self.prefetch_minutes = settings.SCHEDULER_PREFETCH_MINUTES if prefetch_minutes is None else prefetch_minutes
+        self.catch_up_minutes = settings.SCHEDULER_CATCH_UP_MINUTES if catch_up_minutes is None else catch_up_minutes
+        self.refresh_seconds = refresh_seconds or settings.SCHEDULER_REFRESH_SECONDS
+        self.state_path = state_path or settings.SCHEDULER_STATE_FILE
+        self.last_slot = None
+        # 下一次刷新时，只排入晚于该时刻的发送时间
+        self._floor = None
+        self._heap = []
+        self._scheduled = set()
+        self._counter = itertools.count()
+        self._invalid = set()
+        # 已完成预取的发送时刻及其预取结果
+        self._prefetched = {}
+
+    def __len__(self):
+        return len(self._heap)
+
+    def start(self, now):
+        """根据状态文件排入补发窗口，并确定之后排入发送时间的起点"""
+        now = floor_minute(as_utc(now))
+        saved = load_last_slot(self.state_path)
+        if saved is None:
+            self.last_slot = self._floor = now
+            return
+
+        self.last_slot = max(saved, now - timedelta(minutes=self.catch_up_minutes))
+        self._floor = now
+        if self.last_slot < now:
+            window = (self.last_slot, now)
+            logger.info(f"补发 {format_window(window)} 之间错过的发送时间")
+            self._push(now, DELIVER, window, None)
+
+    def _push(self, when, kind, window, key):
+        if (kind, window[1]) in self._scheduled:
+            return
+        self._scheduled.add((kind, window[1]))
+        heapq.heappush(self._heap, (when, next(self._counter), kind, window, key))
+
+    def _schedule(self, key, after, now):
+        """排入 (时区, 发送分钟) 在 after 之后的下一次投递，以及还来得及执行的预取"""
+        zone_name, minute = key
+        # 已投递过的发送时刻不再排入，避免刷新时重复投递
+        if self.last_slot is not None:
+            after = max(after, self.last_slot)
+        try:
+            slot = next_slot(zone_name, minute, after)
+        except ValueError as e:
+            if zone_name not in self._invalid:
+                self._invalid.add(zone_name)
+                logger.error(f"无法调度用户的发送时间: {e}")
+            return
+        window = (slot - timedelta(minutes=1), slot)
+        self._push(slot, DELIVER, window, key)
+        prefetch_at = slot - timedelta(minutes=self.prefetch_minutes)
+        if self.prefetch_minutes and prefetch_at > now:
+            self._push(prefetch_at, PREFETCH, window, key)
+
+    def refresh(self, now):
+        """重新读取用户的发送时间并排入尚未排入的投递"""
+        from ..models import db
+
+        try:
+            for key in scheduled_slots():
+                self._schedule(key, self._floor, now)
+            self._floor = max(self._floor, now)
+        except Exception as e:
+            logger.error(f"读取用户发送时间时出错: {e}")
+        finally:
+            db.session.remove()
+
+    def run_pending(self, now):
+        """执行所有已到期的任务"""
+        from ..models import db
+
+        while self._heap and self._heap[0][0] <= now:
+            _, _, kind, window, key = heapq.heappop(self._heap)
+            self._scheduled.discard((kind, window[1]))
+            try:
+                if kind == PREFETCH:
+                    self._prefetched[window[1]] = self.prefetch(window)
+                else:
+                    logger.info(f"开始投递 {format_window(window)} 的论文")
+                    self.deliver(window, self._prefetched.pop(window[1], None))
+            except Exception as e:
+                logger.error(f"执行 {format_window(window)} 的{'预取' if kind == PREFETCH else '投递'}任务时出错: {e}",
+                             exc_info=True)
+            finally:
+                db.session.remove()
+
+            if kind == DELIVER:
+                self.last_slot = max(self.last_slot, window[1])
+                try:
+                    save_last_slot(self.state_path, self.last_slot)
+                except OSError as e:
+                    logger.error(f"写入调度状态文件 {self.state_path} 时出错: {e}")
+                # 排入该发送时间的下一次投递，不必等待下一次刷新
+                if key is not None:
+                    self._schedule(key, window[1], now)
+
+    def run(self, stop_event=None):
+        """
+        运行调度循环，直到 stop_event 被设置
+
+        参数:
+            stop_event: threading.Event 对象，可选
+        """
+        stop_event = stop_event or threading.Event()
+        self.start(datetime.now(dt_timezone.utc))
+        next_refresh = datetime.now(dt_timezone.utc)
+        logger.info("投递调度器已启动")
+
+        while not stop_event.is_set():
+            now = datetime.now(dt_timezone.utc)
+            if now >= next_refresh:
+                self.refresh(now)
+                next_refresh = now + timedelta(seconds=self.refresh_seconds)
+            self.run_pending(now)
+
+            wake_at = min(next_refresh, self._heap[0][0]) if self._heap else next_refresh
+            stop_event.wait(max((wake_at - datetime.now(dt_timezone.utc)).total_seconds(), 0))
+
+        logger.info("投递调度器已停止")
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+# 发送时间调度查询模块
+# 用户的发送时间以一天中的分钟数 (send_minute) 和IANA时区 (timezone) 存储，
+# 在 (is_active, timezone, send_minute) 上有复合索引：给定时间窗口 (start, end]，
+# 按时区把窗口换算为当地时间的分钟区间，只读取窗口内到期的用户
+
+import logging
+from functools import lru_cache
+from datetime import datetime, timedelta, timezone as dt_timezone
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from sqlalchemy import and_, or_, false
+
+logger = logging.getLogger(__name__)
+
+MINUTES_PER_DAY = 24 * 60
+
+
+def parse_send_time(value):
+    """
+    解析 "HH:MM" 格式的发送时间
+
+    返回:
+        int: 一天中的分钟数，格式不正确时返回None
+    """
+    try:
+        hour, minute = (int(part) for part in value.split(':'))
+    except (AttributeError, ValueError):
+        return None
+    if 0 <= hour < 24 and 0 <= minute < 60:
+        return hour * 60 + minute
+    return None
+
+
+def format_send_time(minute):
+    """把一天中的分钟数格式化为 "HH:MM" """
+    return f"{minute // 60:02d}:{minute % 60:02d}"
+
+
+@lru_cache(maxsize=256)
+def get_zone(name):
+    """
+    获取时区对象
+
+    参数:
+        name: IANA时区名，为空时表示服务器本地时间（返回None）
+
+    异常:
+        时区名无效时抛出 ValueError
+    """
+    if not name:
+        return None
+    try:
+        return ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError) as e:
+        raise ValueError(f"未知的时区: {name}") from e
+
+
+def as_utc(moment):
+    """转换为UTC时间；不带时区的时间视为服务器本地时间"""
+    return moment.astimezone(dt_timezone.utc)
+
+
+def to_local(moment, zone):
+    """把时间转换为指定时区（None表示服务器本地时间）的当地时间，去掉时区信息"""
+    return moment.astimezone(zone).replace(tzinfo=None)
+
+
+def floor_minute(moment):
+    """去掉秒和微秒"""
+    return moment.replace(second=0, microsecond=0)
+
+
+def current_window(now=None):
+    """
+    当前这一分钟对应的时间窗口
+
+    返回:
+        tuple: (start, end)，UTC时间，发送时间在 (start, end] 内的用户在这一分钟到期
+    """
+    end = floor_minute(as_utc(now or datetime.now()))
+    return end - timedelta(minutes=1), end
+
+
+def format_window(window):
+    """以服务器本地时间格式化时间窗口，用于日志"""
+    start, end = (to_local(moment, None) for moment in window)
+    if end - start == timedelta(minutes=1):
+        return f"{end:%H:%M}"
+    return f"{start:%Y-%m-%d %H:%M} ~ {end:%Y-%m-%d %H:%M}"
+
+
+def minute_ranges(start, end):
+    """
+    把当地时间窗口 (start, end] 换算为一天中的分钟区间
+
+    返回:
+        list: [(起始分钟, 结束分钟), ...]，两端均包含；窗口跨越午夜时返回两个区间
+    """
+    if end - start >= timedelta(days=1):
+        return [(0, MINUTES_PER_DAY - 1)]
+
+    # 窗口内最早和最晚的整分钟
+    first = floor_minute(start) + timedelta(minutes=1)
+    last = floor_minute(end)
+    if first > last:
+        return []
+
+    first_minute = first.hour * 60 + first.minute
+    last_minute = last.hour * 60 + last.minute
+    if first.date() == last.date():
+        return [(first_minute, last_minute)]
+    return [(first_minute, MINUTES_PER_DAY - 1), (0, last_minute)]
+
+
+def next_slot(zone_name, minute, after):
+    """
+    发送时间在 after 之后（不含）的下一次出现时刻
+
+    参数:
+        zone_name: 用户的时区名，为空时使用服务器本地时间
+        minute: 一天中的分钟数
+        after: 带时区的时间
+
+    返回:
+        datetime: UTC时间
+    """
+    zone = get_zone(zone_name)
+    local = to_local(after, zone)
+    slot = local.replace(hour=minute // 60, minute=minute % 60, second=0, microsecond=0)
+    if slot <= local:
+        slot += timedelta(days=1)
+    return as_utc(slot.replace(tzinfo=zone) if zone else slot)
+
+
+def scheduled_slots():
+    """
+    读取活跃用户所有不同的 (时区, 发送分钟)
+
+    返回:
+        set: {(时区名, 分钟数), ...}
+    """
+    from ..models import User, db
+
+    rows = (db.session.query(User.timezone, User.send_minute)
+            .filter(User.is_active == True, User.send_minute.isnot(None))
+            .distinct())
+    return {(zone_name, minute) for zone_name, minute in rows}
+
+
+def due_users_query(start, end, shard=None):
+    """
+    查询发送时间在时间窗口 (start, end] 内的活跃用户
+
+    每个时区的窗口换算为当地的分钟区间，查询条件可以使用
+    (is_active, timezone, send_minute) 复合索引。
+
+    参数:
+        start: 窗口起点（不含）
+        end: 窗口终点（包含）
+        shard: (分片序号, 分片数)，可选；提供时只返回 用户ID % 分片数 == 分片序号 的用户
+    """
+    from ..models import User, db
+
+    zone_names = [row[0] for row in db.session.query(User.timezone).filter(User.is_active == True).distinct()]
+    conditions = []
+    for zone_name in zone_names:
+        try:
+            zone = get_zone(zone_name)
+        except ValueError as e:
+            logger.error(f"跳过时区无效的用户: {e}")
+            continue
+        ranges = minute_ranges(to_local(start, zone), to_local(end, zone))
+        if not ranges:
+            continue
+        # 每个条件都包含索引的全部列，数据库可以对每个区间分别使用索引再合并结果
+        zone_condition = User.timezone.is_(None) if zone_name is None else User.timezone == zone_name
+        conditions.extend(and_(User.is_active == True, zone_condition, User.send_minute.between(low, high))
+                          for low, high in ranges)
+
+    query = User.query.filter(or_(*conditions) if conditions else false())
+    if shard is not None:
+        index, count = shard
+        query = query.filter(User.id % count == index)
+    return query.order_by(User.id)
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+# SMTP连接池模块
+# 批量发送时保持少量已登录的SMTP连接并连续发送多封邮件，
+# 避免每封邮件都重新进行TLS握手和登录（这也是邮件服务商限流的主要原因）
+
+import ssl
+import queue
+import smtplib
+import logging
+import threading
+
+from src.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class _Connection:
+    """一个已登录的SMTP连接及其已发送的邮件数"""
+
+    def __init__(self, server):
+        self.server = server
+        self.sent = 0
+
+
+class SmtpPool:
+    """
+    可复用的SMTP连接池，可以在多个线程中共享
+
+    连接在第一次发送时才建立；每个连接发送的邮件数达到上限后主动关闭并重新连接；
+    连接被服务器断开时丢弃该连接，并用新连接重试一次。
+    """
+
+    def __init__(self, size=None, max_messages=None):
+        """
+        参数:
+            size: 最多同时保持的连接数，默认使用 settings.SMTP_POOL_SIZE
+            max_messages: 每个连接最多发送的邮件数，默认使用 settings.SMTP_MAX_MESSAGES_PER_CONNECTION
+        """
+        self.size = size or settings.SMTP_POOL_SIZE
+        self.max_messages = max_messages or settings.SMTP_MAX_MESSAGES_PER_CONNECTION
+        # 空闲连接，后进先出，优先复用最近使用过的连接
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(self.size)
+        self._lock = threading.Lock()
+        self.connections_opened = 0
+        self.messages_sent = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _connect(self):
+        """建立并登录一个新的SMTP连接"""
+        if settings.SMTP_USE_SSL:
+            context = ssl.create_default_context()
+            server = smtplib.SMTP_SSL(settings.SMTP_SERVER, settings.SMTP_PORT,
+                                      context=context, timeout=settings.SMTP_TIMEOUT)
+        else:
+            server = smtplib.SMTP(settings.SMTP_SERVER, settings.SMTP_PORT, timeout=settings.SMTP_TIMEOUT)
+            server.starttls()
+        server.login(settings.SENDER_EMAIL, settings.SENDER_PASSWORD)
+        with self._lock:
+            self.connections_opened += 1
+        return _Connection(server)
+
+    @staticmethod
+    def _discard(connection):
+        """关闭连接，忽略关闭过程中的错误"""
+        try:
+            connection.server.quit()
+        except (smtplib.SMTPException, OSError):
+            connection.server.close()
+
+    def _checkout(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            return self._connect()
+
+    def _checkin(self, connection):
+        if connection.sent >= self.max_messages:
+            self._discard(connection)
+        else:
+            self._idle.put(connection)
+
+    def send(self, msg):
+        """
+        发送一封邮件
+
+        参数:
+            msg: email.message.Message 对象，收件人取自 To 头
+
+        异常:
+            发送失败时抛出 smtplib.SMTPException 或 OSError
+        """
+        with self._slots:
+            connection = self._checkout()
+            try:
+                connection.server.send_message(msg)
+            except smtplib.SMTPServerDisconnected:
+                # 空闲连接可能已被服务器关闭，换一个新连接重试一次
+                self._discard(connection)
+                connection = self._connect()
+                try:
+                    connection.server.send_message(msg)
+                except Exception:
+                    self._discard(connection)
+                    raise
+            except smtplib.SMTPException:
+                # 收件人被拒绝等错误不影响连接本身，重置会话后继续复用
+                try:
+                    connection.server.rset()
+                except (smtplib.SMTPException, OSError):
+                    self._discard(connection)
+                else:
+                    self._checkin(connection)
+                raise
+            except Exception:
+                self._discard(connection)
+                raise
+
+            connection.sent += 1
+            with self._lock:
+                self.messages_sent += 1
+            self._checkin(connection)
+
+    def close(self):
+        """关闭所有空闲连接"""
+        while True:
+            try:
+                connection = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(connection)
+
+    def log_stats(self):
+        """将连接复用情况写入日志"""
+        if self.messages_sent:
+            logger.info(f"SMTP连接池：建立 {self.connections_opened} 个连接，发送 {self.messages_sent} 封邮件")
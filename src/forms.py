@@ -8,6 +8,7 @@ from flask_wtf import FlaskForm
 from wtforms import StringField, PasswordField, BooleanField, SubmitField, TextAreaField, TimeField, ValidationError
 from wtforms.validators import DataRequired, Email, EqualTo, Length, URL, Optional
 from .models import User
+from .core.send_schedule import parse_send_time, get_zone
 
 class LoginForm(FlaskForm):
     """用户登录表单"""
@@ -46,7 +47,21 @@ class UserSettingsForm(FlaskForm):
     username = StringField('用户名', validators=[DataRequired(), Length(min=2, max=64)])
     send_time = StringField('每日邮件发送时间 (格式: HH:MM)', validators=[DataRequired()], 
                            render_kw={"placeholder": "08:00"})
+    timezone = StringField('时区', validators=[Optional(), Length(max=64)],
+                           render_kw={"placeholder": "Asia/Shanghai"})
     submit = SubmitField('保存设置')
+    
+    def validate_send_time(self, field):
+        """验证发送时间格式"""
+        if parse_send_time(field.data) is None:
+            raise ValidationError('发送时间格式应为 HH:MM，例如 08:00。')
+    
+    def validate_timezone(self, field):
+        """验证时区名"""
+        try:
+            get_zone(field.data)
+        except ValueError:
+            raise ValidationError('未知的时区，请使用IANA时区名，例如 Asia/Shanghai。')
 
 class PasswordChangeForm(FlaskForm):
     """修改密码表单"""
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+数据库结构升级
+db.create_all() 只会创建缺失的表，这里为已有的表补充模型中新增的列和索引，
+并迁移旧版表中的数据；每一步都可以重复执行
+"""
+
+import logging
+from datetime import datetime
+from sqlalchemy import inspect, text, select, Table, MetaData
+
+from .core.paper_record import PaperRecord
+
+logger = logging.getLogger(__name__)
+
+# 迁移时每批处理的行数
+MIGRATE_BATCH_SIZE = 1000
+# 旧版按用户存储论文标题和URL的表
+LEGACY_SENT_PAPERS = 'sent_papers'
+# 旧版水位表中按用户保存已处理条目指纹的列
+LEGACY_WATERMARK_SEEN = 'seen'
+
+
+def _add_missing_columns(db):
+    """为已有的表添加模型中新增的列（新增列必须允许为空或带有服务端默认值）"""
+    engine = db.engine
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table in db.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {column['name'] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                column_type = column.type.compile(dialect=engine.dialect)
+                conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+                logger.info(f"数据库升级：为表 {table.name} 添加列 {column.name}")
+
+
+def _create_missing_indexes(db):
+    """创建模型中定义但数据库中缺失的索引"""
+    with db.engine.begin() as conn:
+        for table in db.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(bind=conn, checkfirst=True)
+
+
+def _migrate_sent_papers(db):
+    """
+    将旧版按用户存储标题和URL的 sent_papers 表迁移到 papers + user_papers，
+    迁移完成后删除旧表；中途失败时可以重新执行，已迁移的记录会被跳过
+    """
+    from .models import UserPaper
+    from .core.paper_store import store_papers, insert_ignoring_duplicates
+
+    if not inspect(db.engine).has_table(LEGACY_SENT_PAPERS):
+        return
+
+    legacy = Table(LEGACY_SENT_PAPERS, MetaData(), autoload_with=db.engine)
+    statement = insert_ignoring_duplicates(UserPaper.__table__)
+    total = 0
+    last_id = 0
+    while True:
+        rows = db.session.execute(
+            select(legacy.c.id, legacy.c.user_id, legacy.c.paper_url, legacy.c.title, legacy.c.sent_at)
+            .where(legacy.c.id > last_id)
+            .order_by(legacy.c.id)
+            .limit(MIGRATE_BATCH_SIZE)
+        ).all()
+        if not rows:
+            break
+        last_id = rows[-1].id
+
+        papers = [PaperRecord(row.title, None, row.paper_url) for row in rows]
+        paper_ids = store_papers(papers)
+        links = {}
+        for row, paper in zip(rows, papers):
+            paper_id = paper_ids[paper.canonical_key]
+            links.setdefault((row.user_id, paper_id), {
+                'user_id': row.user_id,
+                'paper_id': paper_id,
+                'sent_at': row.sent_at or datetime.utcnow(),
+            })
+        db.session.execute(statement, list(links.values()))
+        db.session.commit()
+        total += len(rows)
+
+    db.session.close()
+    with db.engine.begin() as conn:
+        legacy.drop(conn)
+    logger.info(f"数据库升级：已将 {total} 条已发送论文记录迁移到 papers/user_papers 表")
+
+    # SQLite删除表后不会自动缩小数据库文件
+    if db.engine.dialect.name == 'sqlite':
+        with db.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+            conn.exec_driver_sql('VACUUM')
+
+
+def _rebuild_feed_watermarks(db):
+    """
+    旧版水位表按 (用户, 订阅源) 保存全部条目指纹，改为每个订阅源只保存一份（feed_entries）后重建该表；
+    水位只用于减少重复处理，丢弃后每个订阅源重新处理一次，由已发送论文记录去重
+    """
+    from .models import FeedWatermark
+
+    inspector = inspect(db.engine)
+    if not inspector.has_table(FeedWatermark.__tablename__):
+        return
+    columns = {column['name'] for column in inspector.get_columns(FeedWatermark.__tablename__)}
+    if LEGACY_WATERMARK_SEEN not in columns:
+        return
+
+    with db.engine.begin() as conn:
+        conn.execute(text(f'DROP TABLE {FeedWatermark.__tablename__}'))
+        FeedWatermark.__table__.create(conn)
+    logger.info(f"数据库升级：已重建表 {FeedWatermark.__tablename__}，订阅源条目改为按源记录")
+
+
+def _backfill_send_minutes(db):
+    """根据旧版的 send_time 字符串填充 send_minute"""
+    from .models import User
+    from .core.send_schedule import parse_send_time
+
+    users = User.query.filter(User.send_minute.is_(None), User.send_time.isnot(None)).all()
+    if not users:
+        return
+    filled = 0
+    for user in users:
+        minute = parse_send_time(user.send_time)
+        if minute is None:
+            logger.error(f"数据库升级：无法解析用户 {user.email} 的发送时间 {user.send_time!r}")
+            continue
+        user.send_minute = minute
+        filled += 1
+    db.session.commit()
+    if filled:
+        logger.info(f"数据库升级：已为 {filled} 个用户填充发送分钟数")
+
+
+def upgrade_database(db):
+    """将已有数据库升级到当前的模型定义，需要在应用上下文中调用"""
+    _rebuild_feed_watermarks(db)
+    _add_missing_columns(db)
+    _create_missing_indexes(db)
+    _migrate_sent_papers(db)
+    _backfill_send_minutes(db)
@@ -21,11 +21,20 @@ class User(db.Model, UserMixin):
     password_hash = db.Column(db.String(256), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     last_login = db.Column(db.DateTime)
-    # 发送邮件的时间，格式为"HH:MM"
+    # 发送邮件的时间，格式为"HH:MM"，用于显示；通过 set_send_time 修改
     send_time = db.Column(db.String(5), default="08:00")
+    # 发送时间在一天中的分钟数（0-1439），按 timezone 解释，调度查询使用该列
+    send_minute = db.Column(db.Integer, default=8 * 60)
+    # 用户的IANA时区（如 "Asia/Shanghai"），为空时使用服务器本地时间
+    timezone = db.Column(db.String(64))
     # 用户是否激活
     is_active = db.Column(db.Boolean, default=True)
     
+    # 调度器按时区和发送分钟查询到期的活跃用户
+    __table_args__ = (
+        db.Index('ix_users_schedule', 'is_active', 'timezone', 'send_minute'),
+    )
+    
     # 关联到该用户的订阅
     rss_feeds = db.relationship('RssFeed', backref='user', lazy='dynamic', cascade='all, delete-orphan')
     keywords = db.relationship('Keyword', backref='user', lazy='dynamic', cascade='all, delete-orphan')
@@ -38,6 +47,16 @@ class User(db.Model, UserMixin):
         """检查密码散列"""
         return check_password_hash(self.password_hash, password)
     
+    def set_send_time(self, value):
+        """设置 "HH:MM" 格式的发送时间，同时更新 send_minute"""
+        from .core.send_schedule import parse_send_time, format_send_time
+        
+        minute = parse_send_time(value)
+        if minute is None:
+            raise ValueError(f"发送时间格式应为 HH:MM: {value}")
+        self.send_minute = minute
+        self.send_time = format_send_time(minute)
+    
     def __repr__(self):
         return f'<User {self.email}>'
 
@@ -69,22 +88,103 @@ class Keyword(db.Model):
         return f'<Keyword {self.text}>'
 
 
-class SentPaper(db.Model):
-    """已发送的论文模型，用于避免重复发送"""
-    __tablename__ = 'sent_papers'
+class Paper(db.Model):
+    """论文模型，每篇论文只存储一次，由所有用户共享"""
+    __tablename__ = 'papers'
     
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
-    paper_url = db.Column(db.String(256), nullable=False)
-    title = db.Column(db.String(256))
+    # 与来源无关的论文身份键（arXiv编号 > DOI > 规范化URL）
+    canonical_key = db.Column(db.String(256), unique=True, nullable=False)
+    # 规范化标题的哈希，标题过短时为空，用于识别跨来源的同一篇论文
+    title_key = db.Column(db.String(64), index=True)
+    title = db.Column(db.String(512))
+    summary = db.Column(db.Text)
+    link = db.Column(db.String(512), nullable=False)
+    # 论文来源（arxiv或来源主机名）
+    source = db.Column(db.String(64))
+    published_at = db.Column(db.DateTime)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<Paper {self.canonical_key}>'
+
+
+class UserPaper(db.Model):
+    """已发送给用户的论文，用于避免重复发送"""
+    __tablename__ = 'user_papers'
+    
+    # 联合主键确保同一篇论文不会发送给同一用户两次，同时是按用户统计和去重查询的索引
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    paper_id = db.Column(db.Integer, db.ForeignKey('papers.id'), primary_key=True)
     sent_at = db.Column(db.DateTime, default=datetime.utcnow)
     
-    # 创建联合唯一约束，确保同一篇论文不会发送给同一用户两次
+    # 仪表盘按发送时间倒序列出最近的论文
     __table_args__ = (
-        db.UniqueConstraint('user_id', 'paper_url', name='user_paper_uc'),
+        db.Index('ix_user_papers_user_sent_at', 'user_id', 'sent_at'),
     )
     
     user = db.relationship('User', backref=db.backref('sent_papers', lazy='dynamic'))
+    paper = db.relationship('Paper', lazy='joined')
+    
+    def __repr__(self):
+        return f'<UserPaper {self.user_id}:{self.paper_id}>'
+
+
+class FeedEntry(db.Model):
+    """订阅源中当前存在的条目及其首次出现的时间，所有订阅者共享"""
+    __tablename__ = 'feed_entries'
+    
+    # 规范化的订阅源URL（含TechRxiv），联合主键同时是按订阅源查询的索引
+    source = db.Column(db.String(512), primary_key=True)
+    # 条目的指纹
+    fingerprint = db.Column(db.String(16), primary_key=True)
+    first_seen_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<FeedEntry {self.source}:{self.fingerprint}>'
+
+
+class FeedWatermark(db.Model):
+    """用户的每个订阅源的高水位：上次成功处理该源的时间，首次出现不晚于该时间的条目已处理过"""
+    __tablename__ = 'feed_watermarks'
+    
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    # 规范化的订阅源URL（含TechRxiv）
+    source = db.Column(db.String(512), primary_key=True)
+    # 处理时用户关键词的指纹，关键词变化后水位失效
+    keywords_hash = db.Column(db.String(16), nullable=False)
+    processed_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<FeedWatermark {self.user_id}:{self.source}>'
+
+
+class OutboundEmail(db.Model):
+    """待发送的邮件（发件箱），收集阶段写入，由发送进程投递"""
+    __tablename__ = 'email_outbox'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    recipient = db.Column(db.String(128), nullable=False)
+    subject = db.Column(db.String(256), nullable=False)
+    html_body = db.Column(db.Text, nullable=False)
+    # 状态：pending（等待发送）、sending（发送中）、sent（已发送）、failed（多次重试后失败）
+    status = db.Column(db.String(16), nullable=False, default='pending')
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # 最早可以（重新）发送的时间
+    next_attempt_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # 被发送进程领取的时间，用于回收崩溃进程遗留的邮件
+    claimed_at = db.Column(db.DateTime)
+    sent_at = db.Column(db.DateTime)
+    
+    # 发送进程按状态和下次发送时间领取邮件
+    __table_args__ = (
+        db.Index('ix_email_outbox_status_next_attempt', 'status', 'next_attempt_at'),
+    )
+    
+    user = db.relationship('User', backref=db.backref('outbound_emails', lazy='dynamic'))
     
     def __repr__(self):
-        return f'<SentPaper {self.title}>' 
\ No newline at end of file
+        return f'<OutboundEmail {self.id} {self.status}>'
@@ -8,7 +8,7 @@ from flask import Blueprint, render_template, redirect, url_for, flash, request
 from flask_login import login_required, current_user
 from datetime import datetime
 
-from ..models import db, User, RssFeed, Keyword, SentPaper
+from ..models import db, User, RssFeed, Keyword, UserPaper
 from ..forms import (
     AddRssFeedForm, AddKeywordForm, 
     BatchRssFeedsForm, BatchKeywordsForm,
@@ -30,11 +30,11 @@ def dashboard():
     keyword_count = Keyword.query.filter_by(user_id=current_user.id).count()
     
     # 获取用户的已发送论文数量
-    papers_count = SentPaper.query.filter_by(user_id=current_user.id).count()
+    papers_count = UserPaper.query.filter_by(user_id=current_user.id).count()
     
-    # 获取最近的5篇已发送论文
-    recent_papers = SentPaper.query.filter_by(user_id=current_user.id)\
-        .order_by(SentPaper.sent_at.desc())\
+    # 获取最近的5篇已发送论文（论文信息来自共享的papers表）
+    recent_papers = UserPaper.query.filter_by(user_id=current_user.id)\
+        .order_by(UserPaper.sent_at.desc())\
         .limit(5).all()
     
     # 添加now变量用于模板中显示年份
@@ -73,7 +73,8 @@ def update_settings():
     
     if form.validate_on_submit():
         current_user.username = form.username.data
-        current_user.send_time = form.send_time.data
+        current_user.set_send_time(form.send_time.data)
+        current_user.timezone = form.timezone.data or None
         db.session.commit()
         flash('设置已更新！', 'success')
     else: